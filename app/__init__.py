@@ -39,10 +39,29 @@ def create_app(config_name):
     config[config_name].init_app(app)
 
     login_manager.init_app(app)
+
+    from .utils import data_manager
+    data_manager.init_app(app)
     
     # Adiciona o filtro nl2br ao ambiente Jinja da aplicação
     load_filters(app)
 
+    # Pacotes CSS/JS com hash no nome (helpers asset_tags/asset_urls e `flask build-assets`)
+    from .utils.assets import init_assets
+    init_assets(app)
+
+    # Versões redimensionadas/WebP das imagens de produtos (helper image_sources e `flask process-images`)
+    from .utils.image_pipeline import init_image_pipeline
+    init_image_pipeline(app)
+
+    # Cache permanente dos arquivos enviados (endereçados pelo conteúdo) e `flask gc-blobs`
+    from .utils.blob_store import init_blob_store
+    init_blob_store(app)
+
+    # Compressão gzip/brotli das respostas e dos arquivos estáticos pré-comprimidos
+    from .utils.compression import init_compression
+    init_compression(app)
+
     @login_manager.user_loader
     def load_user(user_id):
         from .utils import data_manager
@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+
+# Funções de conversão das colunas de texto (CSV/SQLite) para os tipos dos modelos,
+# usadas por from_dict (uma linha) e por from_rows (a tabela inteira, coluna a coluna).
+
+
+def json_list(value):
+    """Lista de uma coluna JSON. '[]' (o caso mais comum) não passa pelo json.loads; valores inválidos viram []."""
+    if not value or value == '[]':
+        return []
+    try:
+        decoded = json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return decoded
+
+
+def json_dict(value):
+    """Dicionário de uma coluna JSON. '{}' e vazio não passam pelo json.loads; valores inválidos viram {}."""
+    if not value or value == '{}':
+        return {}
+    try:
+        return json.loads(value)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+def json_column(values, decode):
+    """
+    Decodifica uma coluna JSON inteira. Valores repetidos (ex: os mesmos filtros '[1, 4]'
+    em vários produtos) são decodificados uma vez só; cada linha recebe a sua própria cópia.
+    """
+    decoded = {}
+    column = []
+    for value in values:
+        result = decoded.get(value)
+        if result is None:
+            result = decoded[value] = decode(value)
+        column.append(result.copy())
+    return column
+
+
+def json_text(value):
+    """Texto JSON de uma lista ou dicionário para gravar na coluna; vazios não passam pelo json.dumps."""
+    if isinstance(value, list) and not value:
+        return '[]'
+    if isinstance(value, dict) and not value:
+        return '{}'
+    return json.dumps(value)
+
+
+def parse_datetime(value):
+    """datetime de uma data ISO; datas ausentes ou inválidas viram o momento atual, como sempre nos modelos."""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        return datetime.utcnow()
+
+
+def datetime_column(values):
+    """Converte uma coluna de datas ISO de uma vez; só recorre ao tratamento por valor se alguma for inválida."""
+    try:
+        return list(map(datetime.fromisoformat, values))
+    except (ValueError, TypeError):
+        return [parse_datetime(value) for value in values]
+
+
+def escape_newlines(text):
+    """Quebras de linha viram '\\n' literal, para não quebrar a linha do CSV."""
+    return text.replace('\n', '\\n')
+
+
+def unescape_newlines(text):
+    return text.replace('\\n', '\n')
@@ -1,7 +1,10 @@
+import sys
 from typing import Dict, Any, Optional
 
 class Filter:
-    
+
+    __slots__ = ('id', 'name', 'type')
+
     def __init__(self,
                  id: Optional[int],
                  name: str,
@@ -9,7 +12,8 @@ class Filter:
        
         self.id = id
         self.name = name
-        self.type = type
+        # Poucos tipos distintos ('type', 'brand', 'color', ...): a string é internada.
+        self.type = sys.intern(type) if isinstance(type, str) else type
 
     def to_dict(self) -> Dict[str, Any]:
        
@@ -1,8 +1,19 @@
-import json
-from typing import List, Dict, Any, Optional
+import sys
+from typing import List, Dict, Any, Optional, Iterable
+from app.models.decoding import (
+    json_list, json_dict, json_column, json_text, escape_newlines, unescape_newlines
+)
 
 class Product:
 
+    # Sem __dict__ por instância: o catálogo inteiro fica em cache na memória de cada worker.
+    # description e specs guardam o texto como veio do armazenamento (_raw_*, com '\n' escapado)
+    # e só o convertem no primeiro acesso (_description/_specs ficam None até lá).
+    __slots__ = (
+        'id', 'name', 'brand', 'price', 'status', 'images', '_description', '_raw_description',
+        '_specs', '_raw_specs', 'seller_id', 'filters', 'image_variants'
+    )
+
     def __init__(self,
                  id: Optional[int],
                  name: str,
@@ -13,18 +24,64 @@ class Product:
                  description: str,
                  specs: str,
                  seller_id: int,
-                 filters: Optional[List[int]] = None):
+                 filters: Optional[List[int]] = None,
+                 image_variants: Optional[Dict[str, List[int]]] = None):
         
         self.id = id
         self.name = name
-        self.brand = brand
+        # Marca e status se repetem em muitos produtos: as strings são internadas (uma cópia só).
+        self.brand = sys.intern(brand) if isinstance(brand, str) else brand
         self.price = price
-        self.status = status
+        self.status = sys.intern(status) if isinstance(status, str) else status
         self.images = images if images is not None else []
         self.description = description
         self.specs = specs
         self.seller_id = seller_id
         self.filters = filters if filters is not None else []
+        # Larguras das versões redimensionadas geradas para cada imagem (URL -> [320, 640, ...]).
+        self.image_variants = image_variants if image_variants is not None else {}
+
+    def __copy__(self) -> 'Product':
+        """
+        Cópia com listas e dicionário próprios (images, filters, image_variants): os backends
+        devolvem cópias dos produtos em cache, e alterar uma delas no lugar (ex: append em
+        images) não pode alterar o cache.
+        """
+        clone = Product.__new__(type(self))
+        for slot in Product.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.images = list(self.images)
+        clone.filters = list(self.filters)
+        clone.image_variants = {url: list(widths) for url, widths in self.image_variants.items()}
+        return clone
+
+    # --- CAMPOS DECODIFICADOS SOB DEMANDA ---
+
+    @property
+    def description(self) -> str:
+        if self._description is None:
+            self._description = unescape_newlines(self._raw_description)
+        return self._description
+
+    @description.setter
+    def description(self, value: str):
+        self._description = value
+        self._raw_description = None
+
+    @property
+    def specs(self) -> str:
+        if self._specs is None:
+            self._specs = unescape_newlines(self._raw_specs)
+        return self._specs
+
+    @specs.setter
+    def specs(self, value: str):
+        self._specs = value
+        self._raw_specs = None
+
+    def _escaped(self, decoded, raw):
+        # Um campo nunca lido volta para o armazenamento exatamente como veio, sem converter.
+        return raw if decoded is None else escape_newlines(decoded)
 
     def to_dict(self, simplify: bool = False) -> Dict[str, Any]:
         """
@@ -38,8 +95,8 @@ class Product:
             'status': self.status,
             'images': self.images,
             # Escapa quebras de linha para evitar quebras no CSV
-            'description': self.description.replace('\n', '\\n'),
-            'specs': self.specs.replace('\n', '\\n'),
+            'description': self._escaped(self._description, self._raw_description),
+            'specs': self._escaped(self._specs, self._raw_specs),
         }
         if not simplify:
             data.update({
@@ -47,38 +104,53 @@ class Product:
                 'filters': self.filters
             })
             # Converte listas para strings JSON para salvar no CSV
-            data['images'] = json.dumps(self.images)
-            data['filters'] = json.dumps(self.filters)
+            data['images'] = json_text(self.images)
+            data['filters'] = json_text(self.filters)
+            data['image_variants'] = json_text(self.image_variants)
         return data
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Product':
         """
-        Cria uma instância de Product a partir de um dicionário, restaurando quebras de linha.
+        Cria uma instância de Product a partir de um dicionário. As quebras de linha de
+        description e specs são restauradas só quando esses campos forem lidos.
         """
-        try:
-            images = json.loads(data.get('images', '[]'))
-        except (json.JSONDecodeError, TypeError):
-            images = []
+        return cls.from_rows([data])[0]
 
-        try:
-            filters = json.loads(data.get('filters', '[]'))
-        except (json.JSONDecodeError, TypeError):
-            filters = []
-        
-        # Restaura as quebras de linha escapadas
-        description = data.get('description', '').replace('\\n', '\n')
-        specs = data.get('specs', '').replace('\\n', '\n')
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['Product']:
+        """
+        Decodificação em lote de uma tabela inteira (lista de dicionários, ex: linhas do CSV).
+
+        Cada coluna é convertida de uma vez (int/float sobre a coluna, JSON repetido
+        decodificado uma vez só, '[]' sem json.loads) e os objetos são montados sem
+        passar pelo __init__. description e specs ficam como vieram, até serem lidos.
+        Lança KeyError/ValueError/TypeError se alguma linha for inválida.
+        """
+        rows = list(rows)
+        ids = [int(row['id']) for row in rows]
+        prices = [float(row.get('price', 0.0)) for row in rows]
+        seller_ids = [int(row.get('seller_id', 0)) for row in rows]
+        images = json_column([row.get('images') for row in rows], json_list)
+        filters = json_column([row.get('filters') for row in rows], json_list)
+        image_variants = json_column([row.get('image_variants') for row in rows], json_dict)
 
-        return cls(
-            id=int(data['id']),
-            name=data.get('name', 'Nome Indisponível'),
-            brand=data.get('brand', 'Marca Indisponível'),
-            price=float(data.get('price', 0.0)),
-            status=data.get('status', 'Indisponível'),
-            description=description,
-            specs=specs,
-            seller_id=int(data.get('seller_id', 0)),
-            images=images,
-            filters=filters
-        )
+        intern = sys.intern
+        products = []
+        for index, row in enumerate(rows):
+            product = cls.__new__(cls)
+            product.id = ids[index]
+            product.name = row.get('name', 'Nome Indisponível')
+            brand = row.get('brand', 'Marca Indisponível')
+            product.brand = intern(brand) if isinstance(brand, str) else brand
+            product.price = prices[index]
+            status = row.get('status', 'Indisponível')
+            product.status = intern(status) if isinstance(status, str) else status
+            product.images = images[index]
+            product._description, product._raw_description = None, row.get('description') or ''
+            product._specs, product._raw_specs = None, row.get('specs') or ''
+            product.seller_id = seller_ids[index]
+            product.filters = filters[index]
+            product.image_variants = image_variants[index]
+            products.append(product)
+        return products
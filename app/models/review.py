@@ -1,8 +1,12 @@
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterable, List
+from app.models.decoding import datetime_column
 
 class Review:
 
+    # Sem __dict__ por instância: as avaliações ficam em cache, agrupadas por produto.
+    __slots__ = ('id', 'rating', 'comment', 'media_url', 'date_posted', 'user_id', 'product_id')
+
     def __init__(self,
                  id: Optional[int],
                  rating: int,
@@ -35,20 +39,34 @@ class Review:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Review':
      
-        try:
-            date_posted = datetime.fromisoformat(data.get('date_posted'))
-        except (ValueError, TypeError):
-            date_posted = datetime.utcnow()
-
-        return cls(
-            id=int(data.get('id', 0)),
-            rating=int(data.get('rating', 0)),
-            comment=data.get('comment', ''),
-            media_url=data.get('media_url'),
-            date_posted=date_posted,
-            user_id=int(data.get('user_id', 0)),
-            product_id=int(data.get('product_id', 0))
-        )
+        return cls.from_rows([data])[0]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['Review']:
+        """
+        Decodificação em lote de uma tabela inteira, coluna a coluna. date_posted é convertida
+        já na carga (não sob demanda), porque ordena as páginas de avaliações.
+        Lança ValueError/TypeError se alguma linha for inválida.
+        """
+        rows = list(rows)
+        ids = [int(row.get('id', 0)) for row in rows]
+        ratings = [int(row.get('rating', 0)) for row in rows]
+        user_ids = [int(row.get('user_id', 0)) for row in rows]
+        product_ids = [int(row.get('product_id', 0)) for row in rows]
+        dates = datetime_column([row.get('date_posted') for row in rows])
+
+        reviews = []
+        for index, row in enumerate(rows):
+            review = cls.__new__(cls)
+            review.id = ids[index]
+            review.rating = ratings[index]
+            review.comment = row.get('comment', '')
+            review.media_url = row.get('media_url')
+            review.date_posted = dates[index]
+            review.user_id = user_ids[index]
+            review.product_id = product_ids[index]
+            reviews.append(review)
+        return reviews
 
     def __repr__(self) -> str:
 
@@ -1,15 +1,25 @@
+import sys
 from datetime import datetime
-from typing import Dict, Any, Optional
-from flask_login import UserMixin
+from typing import Dict, Any, Optional, Iterable, List
+from app.models.decoding import parse_datetime
 from werkzeug.security import generate_password_hash, check_password_hash
 
-class User(UserMixin):
+class User:
     """
     Representa um usuário no sistema.
 
-    Esta classe herda de UserMixin do Flask-Login para fornecer as implementações
-    padrão necessárias para o gerenciamento de sessão de usuários.
+    Implementa a interface que o Flask-Login espera (is_authenticated, is_active,
+    is_anonymous e get_id) diretamente, em vez de herdar de UserMixin: o UserMixin
+    não declara __slots__, e herdar dele devolveria um __dict__ a cada instância.
     """
+
+    # Sem __dict__ por instância: os usuários ficam em cache na memória de cada worker.
+    # date_joined guarda o texto ISO como veio do armazenamento (_raw_date_joined) e
+    # só vira datetime no primeiro acesso; a maioria das telas nunca lê a data.
+    __slots__ = (
+        'id', 'username', 'email', 'password_hash', 'role', 'profile_picture',
+        '_date_joined', '_raw_date_joined', 'address', 'city', 'state', 'zip_code'
+    )
     def __init__(self,
                  id: Optional[int],
                  username: str,
@@ -42,7 +52,8 @@ class User(UserMixin):
         self.username = username
         self.email = email
         self.password_hash = password_hash
-        self.role = role
+        # Poucos papéis distintos ('user', 'admin'): todas as instâncias compartilham a mesma string.
+        self.role = sys.intern(role) if isinstance(role, str) else role
         self.profile_picture = profile_picture
         self.date_joined = date_joined or datetime.utcnow()
         self.address = address
@@ -50,6 +61,17 @@ class User(UserMixin):
         self.state = state
         self.zip_code = zip_code
 
+    @property
+    def date_joined(self) -> datetime:
+        if self._date_joined is None:
+            self._date_joined = parse_datetime(self._raw_date_joined)
+        return self._date_joined
+
+    @date_joined.setter
+    def date_joined(self, value: datetime):
+        self._date_joined = value
+        self._raw_date_joined = None
+
     def to_dict(self) -> Dict[str, Any]:
         """
         Converte a instância do usuário para um dicionário, ideal para salvar em CSV.
@@ -64,7 +86,8 @@ class User(UserMixin):
             'password_hash': self.password_hash,
             'role': self.role,
             'profile_picture': self.profile_picture or '',
-            'date_joined': self.date_joined.isoformat(),
+            # Uma data nunca lida volta para o armazenamento como veio.
+            'date_joined': self._raw_date_joined if self._date_joined is None and self._raw_date_joined else self.date_joined.isoformat(),
             'address': self.address or '',
             'city': self.city or '',       
             'state': self.state or '',   
@@ -82,28 +105,64 @@ class User(UserMixin):
         Returns:
             User: Uma nova instância da classe User.
         """
-        # Converte a data de string ISO para objeto datetime, com fallback para o tempo atual.
-        try:
-            date_joined = datetime.fromisoformat(data.get('date_joined'))
-        except (ValueError, TypeError):
-            date_joined = datetime.utcnow()
-        
-        return cls(
-            id=int(data['id']),
-            username=data.get('username', 'Usuário Anônimo'),
-            email=data.get('email', ''),
-            password_hash=data.get('password_hash', ''),
-            role=data.get('role', 'user'),
-            profile_picture=data.get('profile_picture'),
-            date_joined=date_joined,
-            address=data.get('address'), 
-            city=data.get('city'),      
-            state=data.get('state'),    
-            zip_code=data.get('zip_code') 
-        )
+        return cls.from_rows([data])[0]
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> List['User']:
+        """
+        Decodificação em lote de uma tabela inteira (lista de dicionários, ex: linhas do CSV).
+
+        Os IDs são convertidos de uma vez e os objetos montados sem passar pelo __init__;
+        date_joined só é convertida para datetime quando for lida.
+        Lança KeyError/ValueError/TypeError se alguma linha for inválida.
+        """
+        rows = list(rows)
+        ids = [int(row['id']) for row in rows]
+
+        intern = sys.intern
+        users = []
+        for index, row in enumerate(rows):
+            user = cls.__new__(cls)
+            user.id = ids[index]
+            user.username = row.get('username', 'Usuário Anônimo')
+            user.email = row.get('email', '')
+            user.password_hash = row.get('password_hash', '')
+            role = row.get('role', 'user')
+            user.role = intern(role) if isinstance(role, str) else role
+            user.profile_picture = row.get('profile_picture')
+            # Datas ausentes ou inválidas viram o momento atual no primeiro acesso (parse_datetime).
+            user._date_joined, user._raw_date_joined = None, row.get('date_joined')
+            user.address = row.get('address')
+            user.city = row.get('city')
+            user.state = row.get('state')
+            user.zip_code = row.get('zip_code')
+            users.append(user)
+        return users
+
+    # --- INTERFACE DO FLASK-LOGIN ---
+
+    @property
+    def is_active(self) -> bool:
+        return True
+
+    @property
+    def is_authenticated(self) -> bool:
+        return self.is_active
+
+    @property
+    def is_anonymous(self) -> bool:
+        return False
 
     def get_id(self) -> str:
         """
         Retorna o ID do usuário como uma string, conforme exigido pelo Flask-Login.
         """
         return str(self.id)
+
+    def __eq__(self, other):
+        """Dois objetos User são iguais se representam o mesmo usuário (mesmo ID), como no UserMixin."""
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    __hash__ = object.__hash__
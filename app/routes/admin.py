@@ -7,17 +7,26 @@ from flask import (
 )
 from flask_login import login_required, current_user, login_user, logout_user
 from werkzeug.security import check_password_hash
-from werkzeug.utils import secure_filename
 
 from app.models.product import Product
 from app.models.filter import Filter
 from app.utils import data_manager
+from app.utils.response_cache import catalog_cache
+from app.utils.image_pipeline import schedule_product_images, remove_image
+from app.utils.uploads import run_parallel
 
 # --- BLUEPRINTS ---
 admin_page_bp = Blueprint('admin_page', __name__)
 admin_api_bp = Blueprint('admin_api', __name__)
 
 
+@admin_api_bp.after_request
+def invalidate_catalog_cache(response):
+    """Descarta as respostas em cache do catálogo após qualquer escrita bem-sucedida do admin."""
+    if request.method in ('POST', 'PUT', 'PATCH', 'DELETE') and response.status_code < 400:
+        catalog_cache.invalidate()
+    return response
+
 # --- FUNÇÃO AUXILIAR DE SEGURANÇA ---
 def admin_required(f):
     @wraps(f)
@@ -56,6 +65,21 @@ def admin_logout():
     logout_user()
     return redirect(url_for('public.home'))
 
+def _uploaded_images():
+    """Arquivos enviados no campo 'images', ignorando o campo vazio que o formulário envia sem seleção."""
+    return [image for image in request.files.getlist('images') if image.filename]
+
+def _store_images(images):
+    """
+    Grava as imagens enviadas no armazenamento por conteúdo (em paralelo, em blocos) e
+    retorna as suas URLs, na ordem de envio. Imagens repetidas entram uma vez só.
+    """
+    return list(dict.fromkeys(run_parallel(data_manager.store_upload, images)))
+
+def _product_upload_folder(product_id):
+    """Pasta das imagens de produtos enviadas antes do armazenamento por conteúdo."""
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], str(product_id))
+
 # --- ROTAS DA API DE PRODUTOS (CRUD) ---
 @admin_api_bp.route('/products', methods=['GET'])
 @admin_required
@@ -76,9 +100,8 @@ def get_product(product_id):
 def create_product():
     try:
         product_data = json.loads(request.form.get('product_data'))
-        images = request.files.getlist('images')
+        images = _uploaded_images()
 
-        # Passo 1: Cria o produto sem imagens para obter um ID
         new_product = Product(
             id=None, 
             name=product_data['name'], 
@@ -91,24 +114,15 @@ def create_product():
             seller_id=current_user.id, 
             filters=product_data.get('filters', [])
         )
+
+        # Passo 1: Grava as imagens (um arquivo por conteúdo, compartilhado entre produtos)
+        new_product.images = _store_images(images)
+        # Passo 2: Salva o produto uma única vez, já com as imagens. Um blob que não chegar
+        # a ser referenciado (ex: falha ao salvar) é apagado por `flask gc-blobs`.
         saved_product = data_manager.save_product(new_product)
-        product_id = saved_product.id
-
-        # Passo 2: Processa e salva as imagens na pasta com o ID do produto
-        image_paths = []
-        if images:
-            product_upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], str(product_id))
-            os.makedirs(product_upload_folder, exist_ok=True)
-            
-            for image in images:
-                filename = secure_filename(image.filename)
-                save_path = os.path.join(product_upload_folder, filename)
-                image.save(save_path)
-                image_paths.append(f"/static/uploads/{product_id}/{filename}")
-        
-        # Passo 3: Atualiza o produto com os caminhos das imagens e salva novamente
-        saved_product.images = image_paths
-        data_manager.save_product(saved_product)
+
+        # Passo 3: Gera as versões redimensionadas em segundo plano
+        schedule_product_images(current_app, saved_product)
 
         return jsonify({"message": "Produto criado com sucesso!", "product": saved_product.to_dict()}), 201
     except Exception as e:
@@ -123,7 +137,7 @@ def update_product(product_id):
             return jsonify({"error": "Produto não encontrado"}), 404
         
         product_data = json.loads(request.form.get('product_data'))
-        images = request.files.getlist('images')
+        images = _uploaded_images()
 
         product.name = product_data['name']
         product.brand = product_data['brand']
@@ -133,21 +147,29 @@ def update_product(product_id):
         product.specs = product_data['specs'] # NOVO: Atualiza as especificações
         product.filters = product_data.get('filters', [])
 
-        if images:
-            product_upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], str(product_id))
-            if os.path.exists(product_upload_folder):
-                shutil.rmtree(product_upload_folder) # Remove a pasta antiga de imagens
-            os.makedirs(product_upload_folder, exist_ok=True)
-            
-            image_paths = []
-            for image in images:
-                filename = secure_filename(image.filename)
-                save_path = os.path.join(product_upload_folder, filename)
-                image.save(save_path)
-                image_paths.append(f"/static/uploads/{product_id}/{filename}")
-            product.images = image_paths
+        # A lista final é a das imagens que o admin manteve (existing_images, só as que já eram
+        # do produto) seguida das novas. Imagens mantidas não são regravadas: seguem com a mesma
+        # URL e variantes, e o data_manager desconta só as referências das que saíram.
+        if 'existing_images' in product_data:
+            kept = [url for url in product_data['existing_images'] or [] if url in product.images]
+        else:
+            # Cliente sem o campo: as imagens enviadas substituem as atuais, como antes.
+            kept = [] if images else product.images
+        image_paths = list(dict.fromkeys(kept + (_store_images(images) if images else [])))
+        legacy_removed = {
+            url: product.image_variants.get(url, ()) for url in product.images
+            if url not in image_paths and data_manager.blob_path(url) is None
+        }
+        product.images = image_paths
+        product.image_variants = {
+            url: widths for url, widths in product.image_variants.items() if url in image_paths
+        }
         
         data_manager.save_product(product)
+        # Só depois de salvar: apaga as imagens antigas (da pasta do produto) que saíram
+        for url, widths in legacy_removed.items():
+            remove_image(os.path.join(_product_upload_folder(product_id), os.path.basename(url)), widths)
+        schedule_product_images(current_app, product)
         return jsonify({"message": "Produto atualizado com sucesso!", "product": product.to_dict()})
     except Exception as e:
         return jsonify({"error": str(e)}), 400
@@ -156,9 +178,9 @@ def update_product(product_id):
 @admin_required
 def delete_product(product_id):
     if data_manager.delete_product(product_id):
-        product_upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], str(product_id))
+        product_upload_folder = _product_upload_folder(product_id)
         if os.path.exists(product_upload_folder):
-            shutil.rmtree(product_upload_folder) # Remove a pasta de imagens do produto
+            shutil.rmtree(product_upload_folder) # Remove a pasta de imagens antigas do produto
         return jsonify({"message": "Produto deletado com sucesso!"}), 204
     return jsonify({"error": "Produto não encontrado"}), 404
 
@@ -194,7 +216,7 @@ def get_stats():
     try:
         period = request.args.get('period', 'day')
         total_users = len(data_manager.get_users())
-        total_products = len(data_manager.get_products())
+        total_products = data_manager.count_products()
         total_visits = data_manager.get_visits_count('12m')
         visits_data = data_manager.get_visits_per_period(period)
         stats = {
@@ -1,10 +1,16 @@
+import math
 import uuid
+import base64
+import binascii
+from datetime import datetime
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from app.models.user import User
 from app.utils import data_manager
+from app.utils.response_cache import cached_catalog_response
+from app.utils.image_pipeline import image_sources
 
 # Cria o Blueprint para agrupar as rotas públicas.
 public_bp = Blueprint('public', __name__)
@@ -57,7 +63,11 @@ def products_details(product_id):
     if not product:
         # Se o produto não for encontrado, redireciona para a página de erro 404.
         return redirect(url_for('public.page_not_found'))
-    return render_template('public/products-details.html', product=product)
+    reviews, next_cursor = _reviews_page(product_id)
+    return render_template(
+        'public/products-details.html', product=product, reviews=reviews, review_authors=_review_authors(reviews),
+        reviews_next_cursor=next_cursor, rating=data_manager.get_rating_summary(product_id)
+    )
 
 @public_bp.route('/checkout')
 @login_required
@@ -65,6 +75,45 @@ def checkout():
     """Renderiza a página de finalização de compra."""
     return render_template('public/checkout.html')
 
+# Avaliações por página, na página de detalhes e em /api/products/<id>/reviews.
+REVIEWS_PAGE_SIZE = 10
+
+def _encode_review_cursor(review):
+    """Cursor opaco para a URL com a posição (date_posted, id) de uma avaliação."""
+    raw = f'{review.date_posted.isoformat()}|{review.id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_review_cursor(cursor):
+    """Tupla (date_posted, id) de um cursor. Lança ValueError se ele for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        date_posted, review_id = raw.rsplit('|', 1)
+        date_posted = datetime.fromisoformat(date_posted)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(str(e))
+    # As datas das avaliações não têm fuso; comparar com uma que tem lançaria TypeError.
+    if date_posted.tzinfo is not None:
+        raise ValueError('O cursor não pode ter fuso horário.')
+    return date_posted, int(review_id)
+
+def _reviews_page(product_id, before=None, rating=None):
+    """Uma página de avaliações e o cursor da próxima (None se for a última)."""
+    # Uma avaliação a mais indica se existe outra página, sem precisar contar o total.
+    reviews = data_manager.get_reviews_page(product_id, before, rating, REVIEWS_PAGE_SIZE + 1)
+    if len(reviews) <= REVIEWS_PAGE_SIZE:
+        return reviews, None
+    reviews = reviews[:REVIEWS_PAGE_SIZE]
+    return reviews, _encode_review_cursor(reviews[-1])
+
+def _review_authors(reviews):
+    """{ID do usuário: nome} dos autores de uma página de avaliações."""
+    authors = {}
+    for review in reviews:
+        if review.user_id not in authors:
+            author = data_manager.get_user_by_id(review.user_id)
+            authors[review.user_id] = author.username if author else 'Usuário removido'
+    return authors
+
 # --- ROTAS DE AUTENTICAÇÃO ---
 
 @public_bp.route('/login', methods=['GET', 'POST'])
@@ -97,8 +146,7 @@ def register():
         email = request.form.get('email')
         password = request.form.get('senha')
         
-        users = data_manager.get_users()
-        if any(u.email == email for u in users):
+        if data_manager.email_exists(email):
             flash('Este email já está em uso. Por favor, escolha outro.', 'warning')
             return redirect(url_for('public.register'))
 
@@ -126,25 +174,103 @@ def logout():
 
 # --- ROTAS DE API (JSON) ---
 
+# Ordenações aceitas por /api/products (?sort=price, ?sort=-price, ...).
+PRODUCT_SORT_FIELDS = ('id', 'price', 'name')
+PRODUCT_FIELDS = (
+    'id', 'name', 'brand', 'price', 'status', 'images', 'cover_image', 'description', 'type', 'filter_names', 'rating'
+)
+DEFAULT_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 100
+
+def _price_arg(name):
+    """Preço opcional da query string (None se ausente). Lança ValueError se não for um número finito."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    price = float(value)
+    if not math.isfinite(price):
+        raise ValueError(name)
+    return price
+
+def _rating_payload(summary):
+    """Média e quantidade de avaliações de um produto, no formato das APIs de listagem."""
+    return {'average': round(summary.average, 2), 'count': summary.count}
+
 @public_bp.route('/api/products')
+@cached_catalog_response
 def get_all_products():
-    """API: Retorna todos os produtos em formato JSON para a página de listagem."""
+    """
+    API: Retorna os produtos em formato JSON para a página de listagem.
+
+    Parâmetros opcionais (query string):
+        page, page_size: paginação; a resposta passa a ser um objeto com `items`,
+            `total`, `page`, `page_size` e `pages`.
+        sort: 'id', 'price' ou 'name', com '-' na frente para ordem decrescente.
+        fields: lista separada por vírgulas dos campos de cada produto (ex: id,name,price).
+            `cover_image` traz src/srcset/webp_srcset da primeira imagem, nos tamanhos gerados.
+            `rating` traz a média (`average`) e a quantidade (`count`) de avaliações.
+        filters: IDs de filtros separados por vírgulas. Filtros do mesmo tipo são
+            combinados com OU e tipos diferentes com E.
+        min_price, max_price: faixa de preço.
+    Com paginação, a resposta inclui também `facets` (cada filtro com a contagem de
+    produtos que ele teria no resultado) e `price_range` do catálogo.
+    Sem `page`, `page_size` ou `sort`, retorna uma lista simples, como antes.
+    """
+    args = request.args
+    sort = args.get('sort', 'id')
+    sort_field = sort.lstrip('-')
+    fields = [field for field in args.get('fields', '').split(',') if field]
+    if sort_field not in PRODUCT_SORT_FIELDS:
+        return jsonify({"error": f"Ordenação inválida: {sort}."}), 400
+    invalid_fields = [field for field in fields if field not in PRODUCT_FIELDS]
+    if invalid_fields:
+        return jsonify({"error": f"Campos inválidos: {', '.join(invalid_fields)}."}), 400
+    try:
+        selected_filters = [int(fid) for fid in args.get('filters', '').split(',') if fid]
+    except ValueError:
+        return jsonify({"error": "O parâmetro filters deve conter IDs numéricos."}), 400
+    try:
+        min_price, max_price = _price_arg('min_price'), _price_arg('max_price')
+    except ValueError:
+        return jsonify({"error": "Os parâmetros min_price e max_price devem ser números."}), 400
+    faceted = bool(selected_filters) or min_price is not None or max_price is not None
+    paginated = any(param in args for param in ('page', 'page_size', 'sort'))
+
     try:
-        all_products = data_manager.get_products()
         all_filters = data_manager.get_filters()
         
         filter_map = {f.id: f.name for f in all_filters}
+        # Posição de cada filtro do tipo 'type', para escolher o tipo principal de cada produto.
+        type_position = {f.id: i for i, f in enumerate(all_filters) if f.type == 'type'}
+
+        if faceted or paginated:
+            matching_ids, facet_counts = data_manager.filter_products(selected_filters, min_price, max_price)
+        if paginated:
+            # Faixa de preço, ordenação e contagem rodam sobre a cópia colunar do catálogo (IDs e
+            # preços em arrays); o índice de facetas só restringe pelos filtros marcados e dá as
+            # contagens. Só os produtos da página são lidos do armazenamento.
+            ordered_ids = data_manager.list_product_ids(
+                matching_ids if selected_filters else None, sort_field, descending=sort.startswith('-'),
+                min_price=min_price, max_price=max_price
+            )
+            total = len(ordered_ids)
+            page_size = max(1, min(args.get('page_size', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+            pages = max(1, -(-total // page_size))
+            page = max(1, min(args.get('page', 1, type=int), pages))
+            all_products = data_manager.get_products_by_ids(ordered_ids[(page - 1) * page_size:page * page_size])
+        else:
+            all_products = data_manager.get_products()
+            if faceted:
+                matching_ids = set(matching_ids)
+                all_products = [p for p in all_products if p.id in matching_ids]
         
+        ratings = data_manager.get_rating_summaries([p.id for p in all_products])
         products_list = []
         for p in all_products:
             filter_names = [filter_map.get(fid) for fid in p.filters if fid in filter_map]
-            
-            product_type = ""
-            type_filters = [f.name for f in all_filters if f.type == 'type']
-            for t in type_filters:
-                if t in filter_names:
-                    product_type = t
-                    break
+
+            type_ids = [fid for fid in p.filters if fid in type_position]
+            product_type = filter_map[min(type_ids, key=type_position.get)] if type_ids else ""
 
             simplified_dict = {
                 'id': p.id,
@@ -153,27 +279,100 @@ def get_all_products():
                 'price': p.price,
                 'status': p.status,
                 'images': p.images,
+                'cover_image': image_sources(p, p.images[0]) if p.images else None,
                 'description': p.description,
                 'type': product_type,
-                'filter_names': filter_names
+                'filter_names': filter_names,
+                'rating': _rating_payload(ratings[p.id]),
             }
+            if fields:
+                simplified_dict = {field: simplified_dict[field] for field in fields}
             products_list.append(simplified_dict)
-            
+
+        if paginated:
+            min_catalog_price, max_catalog_price = data_manager.get_price_range()
+            return jsonify({
+                'items': products_list,
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'pages': pages,
+                'facets': [{**f.to_dict(), 'count': facet_counts.get(f.id, 0)} for f in all_filters],
+                'price_range': {'min': min_catalog_price, 'max': max_catalog_price},
+            })
         return jsonify(products_list)
     except Exception as e:
         print(f"Erro na API get_all_products: {e}")
         return jsonify({"error": "Não foi possível carregar os produtos."}), 500
 
+@public_bp.route('/api/products/<int:product_id>/reviews')
+def get_product_reviews(product_id):
+    """
+    API: Avaliações de um produto, da mais recente para a mais antiga, REVIEWS_PAGE_SIZE por página.
+
+    Parâmetros opcionais (query string):
+        rating: só as avaliações com essa nota (1 a 5).
+        cursor: o `next_cursor` da página anterior. A paginação é por posição
+            (date_posted, id), não por deslocamento: cada página custa o mesmo, não
+            importa quantas vieram antes, e avaliações novas não repetem itens.
+    """
+    if not data_manager.get_product_by_id(product_id):
+        return jsonify({"error": "Produto não encontrado."}), 404
+    rating = request.args.get('rating', type=int)
+    if 'rating' in request.args and rating not in range(1, 6):
+        return jsonify({"error": "O parâmetro rating deve ser um número de 1 a 5."}), 400
+    try:
+        before = _decode_review_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({"error": "Cursor inválido."}), 400
+
+    try:
+        reviews, next_cursor = _reviews_page(product_id, before, rating)
+        authors = _review_authors(reviews)
+        return jsonify({
+            'items': [{**review.to_dict(), 'author': authors[review.user_id]} for review in reviews],
+            'next_cursor': next_cursor,
+            'page_size': REVIEWS_PAGE_SIZE,
+        })
+    except Exception as e:
+        print(f"Erro na API get_product_reviews: {e}")
+        return jsonify({"error": "Não foi possível carregar as avaliações."}), 500
+
+@public_bp.route('/api/products/search')
+@cached_catalog_response
+def search_products():
+    """API: Busca produtos pelo termo `q` (nome, marca, descrição, especificações e filtros)."""
+    query = request.args.get('q', '').strip()
+    limit = request.args.get('limit', 10, type=int)
+    if not query:
+        return jsonify([])
+    try:
+        results = data_manager.search_products(query, limit=max(1, min(limit, 50)))
+        products_list = [{
+            'id': p.id,
+            'name': p.name,
+            'brand': p.brand,
+            'price': p.price,
+            'status': p.status,
+            'images': p.images,
+            'description': p.description,
+        } for p in results]
+        return jsonify(products_list)
+    except Exception as e:
+        print(f"Erro na API search_products: {e}")
+        return jsonify({"error": "Não foi possível realizar a busca."}), 500
+
 @public_bp.route('/api/products/featured')
+@cached_catalog_response
 def get_featured_products():
     """API: Retorna até 4 produtos marcados como 'Em destaque' para a página inicial."""
     try:
-        all_products = data_manager.get_products()
-        featured_products = [p for p in all_products if p.status == 'Em destaque']
+        # aqui muda a quantidade de produtos em destaque que aparecem
+        featured_products = data_manager.get_products_by_status('Em destaque', limit=12)
+        ratings = data_manager.get_rating_summaries([p.id for p in featured_products])
         
         products_list = []
-        for p in featured_products[:12]:
-            """ aqui muda a quantidade de produtos em destaque que aparecem"""
+        for p in featured_products:
             # Constrói o dicionário manualmente para garantir que 'images' seja uma lista
             product_dict = {
                 'id': p.id,
@@ -182,7 +381,9 @@ def get_featured_products():
                 'price': p.price,
                 'status': p.status,
                 'images': p.images,  
+                'cover_image': image_sources(p, p.images[0]) if p.images else None,
                 'description': p.description,
+                'rating': _rating_payload(ratings[p.id]),
             }
             products_list.append(product_dict)
             
@@ -4,7 +4,6 @@ from flask import (
 )
 from flask_login import login_required, current_user
 from werkzeug.security import generate_password_hash
-from werkzeug.utils import secure_filename
 
 from app.utils import data_manager
 
@@ -48,27 +47,22 @@ def update_profile():
         current_user.zip_code = request.form.get('zip')
         if password:
             current_user.password_hash = generate_password_hash(password)
+        old_picture = current_user.profile_picture
         if profile_picture_file and profile_picture_file.filename != '':
-            user_upload_folder = os.path.join(data_manager.DATA_FOLDER, 'uploads', 'users', str(current_user.id))
-            
-            os.makedirs(user_upload_folder, exist_ok=True)
-            # Deleta a foto antiga, se existir
-            if current_user.profile_picture:
-                old_picture_filename = os.path.basename(current_user.profile_picture)
-                old_picture_path = os.path.join(user_upload_folder, old_picture_filename)
-                if os.path.exists(old_picture_path):
-                    os.remove(old_picture_path)
-                    
-            # Salva o novo arquivo
-            filename = secure_filename(profile_picture_file.filename)
-            save_path = os.path.join(user_upload_folder, filename)
-            profile_picture_file.save(save_path)
-            
-            # Atualiza o caminho da imagem no modelo de usuário
-            current_user.profile_picture = url_for('user.profile_picture', filename=f"{current_user.id}/{filename}")
+            # Salva o novo arquivo no armazenamento por conteúdo; ao salvar o usuário, o
+            # data_manager desconta a referência da foto antiga (apagada se ninguém mais a usa).
+            current_user.profile_picture = data_manager.store_upload(profile_picture_file)
         
         # Salva o objeto User atualizado no arquivo CSV
         data_manager.save_user(current_user)
+
+        # Deleta a foto antiga da pasta do usuário, se ela for anterior ao armazenamento por conteúdo
+        if old_picture and old_picture != current_user.profile_picture and data_manager.blob_path(old_picture) is None:
+            old_picture_path = os.path.join(
+                data_manager.DATA_FOLDER, 'uploads', 'users', str(current_user.id), os.path.basename(old_picture)
+            )
+            if os.path.exists(old_picture_path):
+                os.remove(old_picture_path)
         
         flash('Seu perfil foi atualizado com sucesso!', 'success')
 
@@ -80,8 +74,8 @@ def update_profile():
 @user_bp.route('/profile-pictures/<path:filename>')
 def profile_picture(filename):
     """
-    Serve a foto de perfil do usuário a partir da pasta de dados,
-    fora do diretório 'static'.
+    Serve as fotos de perfil antigas, gravadas na pasta de dados fora do diretório
+    'static'. Fotos novas ficam no armazenamento por conteúdo (BLOB_FOLDER).
     """
     # A URL é formatada como "ID/nome_do_arquivo", então precisamos separar.
     user_id = filename.split('/')[0]
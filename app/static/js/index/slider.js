@@ -46,7 +46,7 @@ export function initSlider() {
             const card = document.createElement('div');
             card.classList.add('cartao-produto');
             card.innerHTML = `
-                <a href="/products-details/${produto.id}"><img src="${produto.images.length > 0 ? produto.images[0] : 'https://placehold.co/300'}" alt="${produto.name}" class="imagem-produto"></a>
+                <a href="/products-details/${produto.id}"><img src="${produto.cover_image ? produto.cover_image.src : 'https://placehold.co/300'}" srcset="${produto.cover_image ? produto.cover_image.srcset : ''}" sizes="(max-width: 600px) 90vw, 300px" alt="${produto.name}" class="imagem-produto" loading="lazy"></a>
                 <div class="info-produto">
                     <a href="/products-details/${produto.id}">
                         <h3 class="nome-produto">${produto.name}</h3>
@@ -5,11 +5,15 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // --- Lógica da Galeria de Imagens ---
     const mainImage = document.getElementById('main-product-image');
+    const mainImageWebp = document.getElementById('main-product-image-webp');
     const thumbnails = document.querySelectorAll('.thumbnail-image');
 
     thumbnails.forEach(thumbnail => {
         thumbnail.addEventListener('click', () => {
-            mainImage.src = thumbnail.src;
+            // A imagem principal usa as variantes maiores da mesma foto (srcset), não a miniatura.
+            mainImageWebp.srcset = thumbnail.dataset.webpSrcset;
+            mainImage.srcset = thumbnail.dataset.srcset;
+            mainImage.src = thumbnail.dataset.src;
             thumbnails.forEach(t => t.classList.remove('active'));
             thumbnail.classList.add('active');
         });
@@ -32,6 +36,68 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // --- Lógica das Avaliações ---
+    // As páginas seguintes vêm de /api/products/<id>/reviews, pelo cursor da última avaliação exibida.
+    const reviewsList = document.getElementById('reviews-list');
+    const loadMoreButton = document.getElementById('reviews-load-more');
+    const ratingFilter = document.getElementById('reviews-rating-filter');
+
+    function reviewItem(review) {
+        const item = document.createElement('li');
+        item.className = 'review-item';
+        const header = document.createElement('div');
+        header.className = 'review-header';
+        const author = document.createElement('strong');
+        author.textContent = review.author;
+        const stars = document.createElement('span');
+        stars.className = 'review-stars';
+        stars.setAttribute('aria-label', `${review.rating} de 5 estrelas`);
+        stars.innerHTML = [1, 2, 3, 4, 5]
+            .map(star => `<i class="${review.rating >= star ? 'fas' : 'far'} fa-star"></i>`)
+            .join('');
+        const date = new Date(review.date_posted);
+        const time = document.createElement('time');
+        time.dateTime = review.date_posted;
+        time.textContent = date.toLocaleDateString('pt-BR');
+        header.append(author, stars, time);
+        item.appendChild(header);
+        if (review.comment) {
+            const comment = document.createElement('p');
+            comment.className = 'review-comment';
+            comment.textContent = review.comment;
+            item.appendChild(comment);
+        }
+        return item;
+    }
+
+    async function loadReviews(reset) {
+        const params = new URLSearchParams();
+        if (ratingFilter.value) params.set('rating', ratingFilter.value);
+        if (!reset && loadMoreButton.dataset.cursor) params.set('cursor', loadMoreButton.dataset.cursor);
+        loadMoreButton.disabled = true;
+        try {
+            const response = await fetch(`${reviewsList.dataset.apiUrl}?${params}`);
+            if (!response.ok) throw new Error(`Erro HTTP: ${response.status}`);
+            const data = await response.json();
+            if (reset) reviewsList.innerHTML = '';
+            data.items.forEach(review => reviewsList.appendChild(reviewItem(review)));
+            if (reset && data.items.length === 0) {
+                reviewsList.innerHTML = '<li class="review-empty">Nenhuma avaliação com essa nota.</li>';
+            }
+            loadMoreButton.dataset.cursor = data.next_cursor || '';
+            loadMoreButton.hidden = !data.next_cursor;
+        } catch (error) {
+            console.error("Erro ao carregar as avaliações:", error);
+        } finally {
+            loadMoreButton.disabled = false;
+        }
+    }
+
+    if (reviewsList && loadMoreButton && ratingFilter) {
+        loadMoreButton.addEventListener('click', () => loadReviews(false));
+        ratingFilter.addEventListener('change', () => loadReviews(true));
+    }
+
     // --- Lógica para Adicionar ao Carrinho ---
     const btnAddToCart = document.querySelector('.btn-add-to-cart');
     const quantityInput = document.getElementById('quantity-input');
@@ -4,16 +4,14 @@
 document.addEventListener('DOMContentLoaded', () => {
     let currentPage = 1;
     const productsPerPage = 12; // Define o máximo de produtos por página
-    let selectedPrice = 0;
-    let selectedTypes = [];
-    let selectedBrands = [];
-    let selectedColors = [];
-    let selectedConnectivities = [];
-    let allProducts = [];
-    let allFilters = [];
+    let filtersRendered = false;
 
+    // A filtragem, a paginação e as contagens de cada filtro são feitas pelo servidor;
+    // a página só baixa os produtos que vai exibir.
     const API_PRODUCTS_URL = "/api/products";
-    const API_FILTERS_URL = "/api/admin/filters";
+    const PRODUCT_FIELDS = "id,name,price,images,cover_image,rating";
+    // Largura aproximada de um card na grade, para o navegador escolher a variante da imagem.
+    const CARD_IMAGE_SIZES = "(max-width: 600px) 90vw, (max-width: 1024px) 45vw, 300px";
 
     const priceRange = document.getElementById('priceRange');
     const priceDisplay = document.getElementById('priceDisplay');
@@ -26,22 +24,36 @@ document.addEventListener('DOMContentLoaded', () => {
     const connectivityFiltersContainer = document.getElementById('connectivity-filters');
     const filterSections = document.querySelectorAll('.filter-section');
 
-    async function fetchData() {
+    function buildQuery(page) {
+        const params = new URLSearchParams({
+            page,
+            page_size: productsPerPage,
+            sort: 'id',
+            fields: PRODUCT_FIELDS
+        });
+        const selectedFilters = Array.from(document.querySelectorAll('.filters input[data-filter-id]:checked'))
+            .map(cb => cb.dataset.filterId);
+        if (selectedFilters.length > 0) params.set('filters', selectedFilters.join(','));
+        if (enablePriceFilter.checked) params.set('max_price', priceRange.value);
+        return `${API_PRODUCTS_URL}?${params.toString()}`;
+    }
+
+    async function fetchPage(page) {
         try {
-            const [productsResponse, filtersResponse] = await Promise.all([
-                fetch(API_PRODUCTS_URL),
-                fetch(API_FILTERS_URL)
-            ]);
-
-            if (!productsResponse.ok) throw new Error('Erro ao buscar produtos.');
-            if (!filtersResponse.ok) throw new Error('Erro ao buscar filtros.');
-
-            allProducts = await productsResponse.json();
-            allFilters = await filtersResponse.json();
-            
-            setupPriceFilter();
-            renderFilters();
-            updateProductList();
+            const response = await fetch(buildQuery(page));
+            if (!response.ok) throw new Error('Erro ao buscar produtos.');
+            const data = await response.json();
+
+            currentPage = data.page;
+            if (!filtersRendered) {
+                setupPriceFilter(data.price_range);
+                renderFilters(data.facets);
+                filtersRendered = true;
+            } else {
+                updateFacetCounts(data.facets);
+            }
+            displayProducts(data.items);
+            displayPagination(data.pages);
         } catch (error) {
             console.error("Erro ao carregar dados:", error);
             if (productList) {
@@ -50,17 +62,16 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function setupPriceFilter() {
-        if (allProducts.length > 0) {
-            const maxPrice = Math.ceil(Math.max(...allProducts.map(p => p.price)));
+    function setupPriceFilter(range) {
+        if (range && range.max > 0) {
+            const maxPrice = Math.ceil(range.max);
             priceRange.max = maxPrice;
             priceRange.value = maxPrice;
-            selectedPrice = maxPrice;
             updatePriceDisplay();
         }
     }
 
-    function renderFilters() {
+    function renderFilters(facets) {
         const containers = {
             type: typeFiltersContainer,
             brand: brandFiltersContainer,
@@ -70,7 +81,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         Object.values(containers).forEach(c => c.innerHTML = '');
 
-        const filtersByType = allFilters.reduce((acc, filter) => {
+        const filtersByType = facets.reduce((acc, filter) => {
             if (!acc[filter.type]) acc[filter.type] = [];
             acc[filter.type].push(filter);
             return acc;
@@ -85,7 +96,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 if(section) section.style.display = 'none';
             } else {
                 filters.forEach(filter => {
-                    container.innerHTML += `<label><input type="checkbox" value="${filter.name}"> ${filter.name}</label>`;
+                    container.innerHTML += `<label><input type="checkbox" value="${filter.name}" data-filter-id="${filter.id}"> ${filter.name} <span class="facet-count" data-count-for="${filter.id}">(${filter.count})</span></label>`;
                 });
             }
         }
@@ -97,25 +108,51 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function displayProducts(page, filteredProducts) {
-        const startIndex = (page - 1) * productsPerPage;
-        const endIndex = startIndex + productsPerPage;
+    function updateFacetCounts(facets) {
+        facets.forEach(filter => {
+            const counter = document.querySelector(`[data-count-for="${filter.id}"]`);
+            if (counter) counter.textContent = `(${filter.count})`;
+        });
+    }
+
+    function productImageHtml(product) {
+        const cover = product.cover_image;
+        if (!cover || !cover.srcset) {
+            return `<img src="${(cover && cover.src) || 'https://placehold.co/400x400/111111/FFFFFF?text=Decibell'}" alt="${product.name}" loading="lazy">`;
+        }
+        return `
+            <picture>
+                <source type="image/webp" srcset="${cover.webp_srcset}" sizes="${CARD_IMAGE_SIZES}">
+                <img src="${cover.src}" srcset="${cover.srcset}" sizes="${CARD_IMAGE_SIZES}" alt="${product.name}" loading="lazy">
+            </picture>`;
+    }
+
+    function productRatingHtml(rating) {
+        if (!rating || !rating.count) return '';
+        const stars = [1, 2, 3, 4, 5]
+            .map(star => `<i class="${rating.average >= star - 0.5 ? 'fas' : 'far'} fa-star"></i>`)
+            .join('');
+        return `<p class="product-rating" aria-label="${rating.average.toFixed(1)} de 5 estrelas">${stars} <span>(${rating.count})</span></p>`;
+    }
+
+    function displayProducts(products) {
         productList.innerHTML = '';
 
-        if (filteredProducts.length === 0) {
+        if (products.length === 0) {
             productList.innerHTML = `<p>Nenhum produto encontrado com os filtros aplicados.</p>`;
             return;
         }
 
-        filteredProducts.slice(startIndex, endIndex).forEach(product => {
+        products.forEach(product => {
             const productArticle = document.createElement('article');
             productArticle.classList.add('product-card');
             productArticle.innerHTML = `
                 <a href="/products-details/${product.id}">
                     <div class="product-image-wrapper">
-                        <img src="${product.images[0] || 'https://placehold.co/400x400/111111/FFFFFF?text=Decibell'}" alt="${product.name}">
+                        ${productImageHtml(product)}
                     </div>
                     <h2 class="product-name">${product.name}</h2>
+                    ${productRatingHtml(product.rating)}
                     <p class="product-price">R$ ${product.price.toFixed(2).replace('.', ',')}</p>
                     <span class="details-link">Saiba mais &rarr;</span>
                 </a>
@@ -124,9 +161,8 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
-    function displayPagination(filteredProducts) {
+    function displayPagination(pageCount) {
         pagination.innerHTML = '';
-        const pageCount = Math.ceil(filteredProducts.length / productsPerPage);
 
         if (pageCount <= 1) return;
 
@@ -135,10 +171,7 @@ document.addEventListener('DOMContentLoaded', () => {
             button.innerText = i;
             if (i === currentPage) button.classList.add('active');
             button.addEventListener('click', () => {
-                currentPage = i;
-                displayProducts(currentPage, filteredProducts);
-                document.querySelectorAll('.pagination button').forEach(btn => btn.classList.remove('active'));
-                button.classList.add('active');
+                fetchPage(i);
                 window.scrollTo({ top: 0, behavior: 'smooth' });
             });
             pagination.appendChild(button);
@@ -151,28 +184,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     function updateProductList() {
-        selectedTypes = Array.from(document.querySelectorAll('#type-filters input:checked')).map(cb => cb.value);
-        selectedBrands = Array.from(document.querySelectorAll('#brand-filters input:checked')).map(cb => cb.value);
-        selectedColors = Array.from(document.querySelectorAll('#color-filters input:checked')).map(cb => cb.value);
-        selectedConnectivities = Array.from(document.querySelectorAll('#connectivity-filters input:checked')).map(cb => cb.value);
-        selectedPrice = parseFloat(priceRange.value);
-        const isPriceFilterActive = enablePriceFilter.checked;
-        
-        const filteredProducts = allProducts.filter(product => {
-            const productFilterNames = product.filter_names || [];
-            
-            const matchesPrice = !isPriceFilterActive || product.price <= selectedPrice;
-            const matchesBrand = selectedBrands.length === 0 || selectedBrands.includes(product.brand);
-            const matchesType = selectedTypes.length === 0 || selectedTypes.some(type => productFilterNames.includes(type));
-            const matchesColor = selectedColors.length === 0 || selectedColors.some(color => productFilterNames.includes(color));
-            const matchesConnectivity = selectedConnectivities.length === 0 || selectedConnectivities.some(conn => productFilterNames.includes(conn));
-
-            return matchesPrice && matchesBrand && matchesType && matchesColor && matchesConnectivity;
-        });
-        
-        currentPage = 1;
-        displayProducts(currentPage, filteredProducts);
-        displayPagination(filteredProducts);
+        fetchPage(1);
     }
 
     enablePriceFilter.addEventListener('change', () => {
@@ -204,5 +216,5 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
-    fetchData();
+    fetchPage(1);
 });
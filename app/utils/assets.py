@@ -0,0 +1,197 @@
+import os
+import re
+import json
+import hashlib
+import click
+from flask import current_app, request, url_for
+from markupsafe import Markup, escape
+from app.utils.safe_io import atomic_write
+
+# Pacotes de arquivos estáticos usados por cada página (caminhos relativos a app/static).
+# Os @import dos CSS são embutidos no pacote, então basta listar o arquivo principal.
+BUNDLES = {
+    'site.css': ['css/index/global.css'],
+    'products.css': ['css/index/global.css', 'css/products/products.css'],
+    'products-details.css': ['css/index/global.css', 'css/products/products-details.css'],
+    'checkout.css': ['css/index/global.css', 'css/checkout/checkout.css'],
+    'login.css': ['css/login/login.css'],
+    'register.css': ['css/login/register.css'],
+    'error_pages.css': ['css/error_pages.css'],
+    'admin.css': ['css/admin/admin_pg/global_admin.css', 'css/admin/admin_pg/admi_stats.css'],
+    'hero-animation.js': ['js/index/hero-animation.js'],
+    'products.js': ['js/main.js', 'js/products.js'],
+    'products-details.js': ['js/main.js', 'js/products-details.js'],
+    'profile.js': ['js/main.js', 'js/user-profile.js'],
+    'checkout.js': ['js/checkout.js'],
+    'error_pages.js': ['js/error_pages.js'],
+    'admin.js': ['js/admin/admin_ui.js', 'js/admin/admin.js', 'js/admin/admin_stats.js'],
+}
+DIST_FOLDER = 'dist'
+MANIFEST_FILE = 'manifest.json'
+# Os pacotes têm o hash do conteúdo no nome, então podem ficar em cache por um ano.
+DIST_MAX_AGE = 365 * 24 * 60 * 60
+
+_IMPORT_RE = re.compile(r'@import\s+(?:url\()?\s*["\']?([^"\')\s;]+)["\']?\s*\)?\s*;')
+_URL_RE = re.compile(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)')
+_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+
+
+def _is_external(url):
+    return url.startswith(('/', '#', 'data:', 'http:', 'https:', '//'))
+
+
+def _inline_css(static_folder, path, seen=None):
+    """
+    Lê um CSS embutindo os @import locais (recursivamente) e reescreve os url()
+    relativos para que continuem válidos a partir da pasta dist.
+    """
+    seen = seen if seen is not None else set()
+    if path in seen:
+        return ''
+    seen.add(path)
+    with open(os.path.join(static_folder, path), 'r', encoding='utf-8') as file:
+        css = _COMMENT_RE.sub('', file.read())
+    base = os.path.dirname(path)
+
+    imports = []
+
+    def replace_import(match):
+        target = match.group(1)
+        if _is_external(target):
+            return match.group(0)
+        # Marca a posição do import; o conteúdo entra depois de reescrever os url() deste arquivo.
+        imports.append(os.path.normpath(os.path.join(base, target)))
+        return f'\0{len(imports) - 1}\0'
+
+    def rewrite_url(match):
+        quote, target = match.groups()
+        if _is_external(target.strip()):
+            return match.group(0)
+        resolved = os.path.normpath(os.path.join(base, target.strip()))
+        return f'url({quote}{os.path.relpath(resolved, DIST_FOLDER).replace(os.sep, "/")}{quote})'
+
+    css = _URL_RE.sub(rewrite_url, _IMPORT_RE.sub(replace_import, css))
+    return re.sub(r'\0(\d+)\0', lambda m: _inline_css(static_folder, imports[int(m.group(1))], seen), css)
+
+
+def minify_css(css):
+    """Minificação conservadora: remove comentários e espaços redundantes, sem reescrever regras."""
+    css = _COMMENT_RE.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def _build_bundle(static_folder, name, sources):
+    if name.endswith('.css'):
+        # @import só é válido no início do arquivo; os externos (ex: fontes) vão para o topo.
+        body = '\n'.join(_inline_css(static_folder, source) for source in sources)
+        external_imports = [m.group(0) for m in _IMPORT_RE.finditer(body)]
+        body = _IMPORT_RE.sub('', body)
+        return minify_css('\n'.join(external_imports + [body]))
+    # JS: apenas concatenação. Cada arquivo é um script clássico que já compartilhava o
+    # escopo global com os outros da página; o ';' protege contra arquivos sem ponto e vírgula final.
+    parts = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), 'r', encoding='utf-8') as file:
+            parts.append(f'/* {source} */\n{file.read()}\n;')
+    return '\n'.join(parts)
+
+
+def build_assets(static_folder, bundles=None):
+    """
+    Gera os pacotes em static/dist com o hash do conteúdo no nome (ex: site.3f2a9c1b.css)
+    e o manifest.json que liga cada pacote ao arquivo gerado. Pacotes antigos são apagados.
+    Retorna o manifesto.
+    """
+    bundles = bundles or BUNDLES
+    dist = os.path.join(static_folder, DIST_FOLDER)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name, sources in bundles.items():
+        content = _build_bundle(static_folder, name, sources).encode('utf-8')
+        stem, extension = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(content).hexdigest()[:10]}{extension}'
+        target = os.path.join(dist, filename)
+        if not os.path.exists(target):
+            with atomic_write(target, mode='wb', newline=None, encoding=None) as file:
+                file.write(content)
+        manifest[name] = f'{DIST_FOLDER}/{filename}'
+    with atomic_write(os.path.join(dist, MANIFEST_FILE)) as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+    # Remove pacotes de builds anteriores (e as suas versões .gz/.br).
+    keep = {os.path.basename(path) for path in manifest.values()} | {MANIFEST_FILE}
+    for name in os.listdir(dist):
+        original = name[:-3] if name.endswith(('.gz', '.br')) else name
+        if original not in keep:
+            os.remove(os.path.join(dist, name))
+    return manifest
+
+
+class AssetManifest:
+    """Lê o manifest.json dos pacotes, relendo-o apenas quando o arquivo muda."""
+
+    def __init__(self, static_folder):
+        self.path = os.path.join(static_folder, DIST_FOLDER, MANIFEST_FILE)
+        self._mtime = None
+        self._entries = {}
+
+    def get(self, name):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._mtime, self._entries = None, {}
+            return None
+        if mtime != self._mtime:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    self._entries = json.load(file)
+                self._mtime = mtime
+            except (OSError, ValueError) as e:
+                print(f"Erro ao ler o manifesto de assets {self.path}: {e}")
+                self._entries = {}
+        return self._entries.get(name)
+
+
+def asset_urls(name):
+    """
+    URLs de um pacote: o arquivo gerado por `flask build-assets`, se existir, ou os
+    arquivos de origem (para desenvolvimento, sem etapa de build).
+    """
+    built = current_app.extensions['asset_manifest'].get(name)
+    if built and not current_app.config.get('ASSETS_DEBUG', False):
+        return [url_for('static', filename=built)]
+    return [url_for('static', filename=source) for source in BUNDLES[name]]
+
+
+def asset_tags(name):
+    """Tags <link>/<script> de um pacote, para uso direto nos templates."""
+    if name.endswith('.css'):
+        template = '<link rel="stylesheet" href="{}">'
+    else:
+        template = '<script src="{}"></script>'
+    return Markup('\n'.join(template.format(escape(url)) for url in asset_urls(name)))
+
+
+def init_assets(app):
+    """Registra os helpers asset_urls/asset_tags no Jinja, o cache dos pacotes e o comando build-assets."""
+    app.extensions['asset_manifest'] = AssetManifest(app.static_folder)
+    app.jinja_env.globals.update(asset_urls=asset_urls, asset_tags=asset_tags)
+
+    @app.after_request
+    def cache_dist_assets(response):
+        filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+        if filename.startswith(DIST_FOLDER + '/') and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = DIST_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Gera os pacotes CSS/JS com hash no nome, o manifesto e as versões .gz/.br."""
+        from app.utils.compression import precompress_static
+        manifest = build_assets(app.static_folder)
+        precompress_static(os.path.join(app.static_folder, DIST_FOLDER))
+        click.echo(f"{len(manifest)} pacote(s) gerado(s) em {DIST_FOLDER}/.")
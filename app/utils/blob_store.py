@@ -0,0 +1,180 @@
+import os
+import glob
+import json
+import time
+import click
+from flask import request
+from app.utils.safe_io import atomic_write, file_lock
+from app.utils.uploads import stage_upload, file_sha256
+
+REFCOUNTS_FILE = 'refcounts.json'
+# O nome de um blob é o hash do conteúdo: o mesmo arquivo nunca muda, então pode ficar em cache para sempre.
+BLOB_MAX_AGE = 365 * 24 * 60 * 60
+# Blobs gravados há menos tempo que isso ainda podem estar esperando a primeira referência
+# (envio concluído, registro ainda não salvo) e não são apagados pela coleta de lixo.
+GC_GRACE_SECONDS = 60 * 60
+_EXTENSION_ALIASES = {'.jpeg': '.jpg'}
+
+
+class BlobStore:
+    """
+    Armazenamento de arquivos enviados endereçado pelo conteúdo.
+
+    Cada arquivo é gravado uma única vez em `<folder>/<2 primeiros dígitos>/<sha256><ext>`,
+    não importa quantos produtos ou usuários o usem. Os modelos guardam a URL do blob
+    (que contém o hash) e o número de referências de cada blob fica em refcounts.json;
+    quando chega a zero, o arquivo e as suas variantes (ex: <sha256>-640w.webp) são apagados
+    (os gravados há menos de GC_GRACE_SECONDS ficam para a coleta de lixo).
+    """
+
+    def __init__(self, folder, url_prefix):
+        self.folder = folder
+        self.url_prefix = url_prefix.rstrip('/') + '/'
+        self.refcounts_path = os.path.join(folder, REFCOUNTS_FILE)
+
+    # --- NOMES E CAMINHOS ---
+
+    def path(self, name):
+        return os.path.join(self.folder, name[:2], name)
+
+    def url(self, name):
+        return f'{self.url_prefix}{name[:2]}/{name}'
+
+    def name_from_url(self, url):
+        """Nome do blob referenciado por uma URL, ou None se a URL não for de um blob."""
+        if not url or not url.startswith(self.url_prefix):
+            return None
+        return url.rsplit('/', 1)[-1] or None
+
+    def names_from_urls(self, urls):
+        return [name for name in map(self.name_from_url, urls) if name]
+
+    # --- GRAVAÇÃO ---
+
+    def put(self, file_storage, prepare=None):
+        """
+        Grava um arquivo enviado (FileStorage), em blocos. Retorna o nome do blob; conteúdo repetido não é regravado.
+        `prepare(caminho, nome do arquivo)` pode alterar o arquivo antes de ele receber o nome
+        (ex: remover metadados de fotos) e retorna True se o alterou; o hash é então recalculado.
+        """
+        filename, temp_path, digest = stage_upload(file_storage, self.folder)
+        extension = os.path.splitext(filename)[1].lower()
+        try:
+            if prepare is not None and prepare(temp_path, filename):
+                digest = file_sha256(temp_path)
+            name = digest + _EXTENSION_ALIASES.get(extension, extension)
+            target = self.path(name)
+            # Sob o lock das referências, para não cruzar com um update_references apagando o mesmo blob.
+            with file_lock(self.refcounts_path):
+                if os.path.exists(target):
+                    # Já existe: só renova o mtime, para a coleta de lixo respeitar o período de carência.
+                    os.utime(target)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return name
+
+    # --- CONTAGEM DE REFERÊNCIAS ---
+
+    def _read_refcounts(self):
+        try:
+            with open(self.refcounts_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Erro ao ler as referências de blobs {self.refcounts_path}: {e}")
+            return {}
+
+    def _write_refcounts(self, refcounts):
+        with atomic_write(self.refcounts_path) as file:
+            json.dump(refcounts, file, sort_keys=True)
+
+    def update_references(self, added=(), removed=()):
+        """
+        Soma uma referência a cada nome de `added` e subtrai uma de cada nome de `removed`.
+        Blobs que ficam sem referências são apagados, exceto os gravados (ou reenviados) há
+        menos de GC_GRACE_SECONDS: um put recente pode estar esperando a sua referência,
+        e esses ficam para a coleta de lixo. Retorna os nomes apagados.
+        """
+        if not added and not removed:
+            return []
+        deleted = []
+        with file_lock(self.refcounts_path):
+            refcounts = self._read_refcounts()
+            for name in added:
+                refcounts[name] = refcounts.get(name, 0) + 1
+            for name in removed:
+                count = refcounts.get(name, 0) - 1
+                if count > 0:
+                    refcounts[name] = count
+                else:
+                    refcounts.pop(name, None)
+                    deleted.append(name)
+            self._write_refcounts(refcounts)
+            now = time.time()
+            deleted = [name for name in deleted if not self._recent(name, now)]
+            for name in deleted:
+                self._delete(name)
+        return deleted
+
+    def _recent(self, name, now, grace_seconds=GC_GRACE_SECONDS):
+        try:
+            return now - os.path.getmtime(self.path(name)) <= grace_seconds
+        except FileNotFoundError:
+            return False
+
+    def _delete(self, name):
+        stem, _ = os.path.splitext(name)
+        for path in [self.path(name)] + glob.glob(os.path.join(self.folder, name[:2], glob.escape(stem) + '-*')):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def collect_garbage(self, referenced_names, grace_seconds=GC_GRACE_SECONDS):
+        """
+        Recalcula as contagens a partir de todas as referências existentes (uma entrada
+        por uso) e apaga os blobs sem nenhuma, exceto os gravados há menos de `grace_seconds`.
+        Corrige contagens perdidas em quedas no meio de uma escrita. Retorna os nomes apagados.
+        """
+        deleted = []
+        now = time.time()
+        with file_lock(self.refcounts_path):
+            refcounts = {}
+            for name in referenced_names:
+                refcounts[name] = refcounts.get(name, 0) + 1
+            self._write_refcounts(refcounts)
+            for path in glob.glob(os.path.join(self.folder, '??', '*')):
+                name = os.path.basename(path)
+                if '-' in os.path.splitext(name)[0]:
+                    continue  # variante de outro blob
+                if name not in refcounts and not self._recent(name, now, grace_seconds):
+                    self._delete(name)
+                    deleted.append(name)
+        return deleted
+
+
+def init_blob_store(app):
+    """Registra o cache permanente dos blobs servidos pela pasta static e o comando `flask gc-blobs`."""
+    from app.utils import data_manager
+    static_prefix = os.path.relpath(app.config['BLOB_FOLDER'], app.static_folder).replace(os.sep, '/') + '/'
+
+    @app.after_request
+    def cache_blobs(response):
+        filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+        if filename.startswith(static_prefix) and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = BLOB_MAX_AGE
+            response.cache_control.immutable = True
+        return response
+
+    @app.cli.command('gc-blobs')
+    def gc_blobs_command():
+        """Recalcula as referências dos arquivos enviados e apaga os que não são mais usados."""
+        deleted = data_manager.collect_blob_garbage()
+        click.echo(f"{len(deleted)} blob(s) apagado(s).")
@@ -0,0 +1,185 @@
+import threading
+from array import array
+from app.utils.search_index import normalize
+
+try:
+    import numpy as np
+except ImportError:  # O NumPy é opcional: sem ele, as consultas percorrem os arrays em Python.
+    np = None
+
+# Ordenações aceitas por CatalogSnapshot.ordered_ids.
+SORT_FIELDS = ('id', 'price', 'name')
+# Tipo NumPy de cada typecode usado nas colunas ('l' tem 4 ou 8 bytes conforme a plataforma).
+_NUMPY_KINDS = {'d': 'f', 'l': 'i', 'H': 'u'}
+
+
+def _numpy_view(column):
+    """
+    View NumPy (sem cópia) de uma coluna. Enquanto ela existir, o array não pode mudar de
+    tamanho, então nunca deve sobreviver à consulta que a criou.
+    """
+    return np.frombuffer(column, dtype=f'{_NUMPY_KINDS[column.typecode]}{column.itemsize}')
+
+
+class CatalogSnapshot:
+    """
+    Cópia colunar do catálogo, só para leitura: uma linha por produto, na ordem do backend.
+
+    Cada coluna é um array contíguo da biblioteca padrão: `ids` e `seller_ids` em
+    array('l'), `prices` em array('d') e `status_codes` em array('H'), com o status
+    codificado por dicionário (`statuses[código]`). Os filtros de cada produto ficam em
+    formato CSR: os IDs dos filtros da linha N são `filter_ids[filter_offsets[N]:filter_offsets[N + 1]]`.
+
+    Filtrar por preço, ordenar e contar percorrem essas colunas, sem acessar atributos
+    de um objeto Product por produto; com o NumPy instalado, as mesmas operações são
+    vetorizadas sobre views dos arrays. Produtos salvos ou excluídos atualizam só a sua
+    linha; `version` guarda a versão do catálogo que a cópia reflete.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.ids = array('l')
+            self.seller_ids = array('l')
+            self.prices = array('d')
+            self.status_codes = array('H')
+            self.statuses = []
+            self._status_code_by_value = {}
+            self.filter_offsets = array('l', [0])
+            self.filter_ids = array('l')
+            # Nomes normalizados (ordenação por nome); strings não cabem num array numérico.
+            self.name_keys = []
+            self._row_by_id = {}
+            self.version = None
+
+    def rebuild(self, products, version=None):
+        with self.lock:
+            self.clear()
+            for product in products:
+                self._append(product)
+            self.version = version
+
+    def __len__(self):
+        return len(self.ids)
+
+    # --- ATUALIZAÇÃO INCREMENTAL ---
+
+    def _status_code(self, status):
+        code = self._status_code_by_value.get(status)
+        if code is None:
+            code = self._status_code_by_value[status] = len(self.statuses)
+            self.statuses.append(status)
+        return code
+
+    def _append(self, product):
+        self._row_by_id[product.id] = len(self.ids)
+        self.ids.append(product.id)
+        self.seller_ids.append(product.seller_id or 0)
+        self.prices.append(product.price)
+        self.status_codes.append(self._status_code(product.status))
+        self.filter_ids.extend(product.filters)
+        self.filter_offsets.append(len(self.filter_ids))
+        self.name_keys.append(normalize(product.name))
+
+    def _shift_offsets(self, row, delta):
+        if delta:
+            tail = self.filter_offsets[row + 1:]
+            self.filter_offsets[row + 1:] = array('l', (offset + delta for offset in tail))
+
+    def index_product(self, product):
+        """Atualiza a linha do produto no lugar, ou acrescenta uma linha se ele for novo."""
+        with self.lock:
+            row = self._row_by_id.get(product.id)
+            if row is None:
+                self._append(product)
+                return
+            self.seller_ids[row] = product.seller_id or 0
+            self.prices[row] = product.price
+            self.status_codes[row] = self._status_code(product.status)
+            self.name_keys[row] = normalize(product.name)
+            start, end = self.filter_offsets[row], self.filter_offsets[row + 1]
+            self.filter_ids[start:end] = array('l', product.filters)
+            self._shift_offsets(row, len(product.filters) - (end - start))
+
+    def remove_product(self, product_id):
+        with self.lock:
+            row = self._row_by_id.pop(product_id, None)
+            if row is None:
+                return
+            for column in (self.ids, self.seller_ids, self.prices, self.status_codes, self.name_keys):
+                del column[row]
+            start, end = self.filter_offsets[row], self.filter_offsets[row + 1]
+            del self.filter_ids[start:end]
+            self._shift_offsets(row, start - end)
+            del self.filter_offsets[row + 1]
+            for shifted_row in range(row, len(self.ids)):
+                self._row_by_id[self.ids[shifted_row]] = shifted_row
+
+    # --- CONSULTA ---
+
+    def count(self, status=None):
+        """Quantidade de produtos, opcionalmente só os com o status informado."""
+        with self.lock:
+            if status is None:
+                return len(self.ids)
+            code = self._status_code_by_value.get(status)
+            if code is None:
+                return 0
+            if np is not None:
+                return int(np.count_nonzero(_numpy_view(self.status_codes) == code))
+            return self.status_codes.count(code)
+
+    def price_range(self):
+        """(menor preço, maior preço) do catálogo, ou (0, 0) se estiver vazio."""
+        with self.lock:
+            if not self.prices:
+                return 0.0, 0.0
+            if np is not None:
+                prices = _numpy_view(self.prices)
+                return float(prices.min()), float(prices.max())
+            return min(self.prices), max(self.prices)
+
+    def ordered_ids(self, product_ids=None, sort='id', descending=False, min_price=None, max_price=None):
+        """
+        IDs dos produtos (todos, ou só os de `product_ids`) com preço na faixa informada,
+        ordenados por 'id', 'price' ou 'name'. Empates mantêm a ordem das linhas, também
+        na ordem decrescente, como o sort estável usado antes sobre a lista de produtos.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Ordenação inválida: {sort}")
+        with self.lock:
+            if product_ids is None:
+                rows = None
+            else:
+                rows = sorted({self._row_by_id[pid] for pid in product_ids if pid in self._row_by_id})
+            if np is not None and sort != 'name':
+                return self._ordered_ids_numpy(rows, sort, descending, min_price, max_price)
+
+            rows = range(len(self.ids)) if rows is None else rows
+            prices = self.prices
+            if min_price is not None or max_price is not None:
+                low = float('-inf') if min_price is None else min_price
+                high = float('inf') if max_price is None else max_price
+                rows = [row for row in rows if low <= prices[row] <= high]
+            key = {'id': self.ids, 'price': prices, 'name': self.name_keys}[sort].__getitem__
+            # reverse=True do sort mantém a ordem original dos empates.
+            rows = sorted(rows, key=key, reverse=descending)
+            ids = self.ids
+            return [ids[row] for row in rows]
+
+    def _ordered_ids_numpy(self, rows, sort, descending, min_price, max_price):
+        ids = _numpy_view(self.ids)
+        prices = _numpy_view(self.prices)
+        rows = np.arange(len(ids)) if rows is None else np.asarray(rows, dtype=np.intp)
+        if min_price is not None:
+            rows = rows[prices[rows] >= min_price]
+        if max_price is not None:
+            rows = rows[prices[rows] <= max_price]
+        keys = (ids if sort == 'id' else prices)[rows]
+        # argsort estável da chave negada: decrescente sem inverter a ordem dos empates.
+        order = np.argsort(-keys if descending else keys, kind='stable')
+        return ids[rows[order]].tolist()
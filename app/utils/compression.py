@@ -0,0 +1,163 @@
+import os
+import gzip
+import mimetypes
+import click
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # O brotli é opcional: sem ele, apenas gzip é usado.
+    brotli = None
+
+# Tipos de conteúdo que valem a pena comprimir (imagens e fontes já vêm comprimidas).
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+    'application/json', 'image/svg+xml',
+}
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.html', '.json', '.txt')
+# Extensão do arquivo pré-comprimido de cada codificação, em ordem de preferência.
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encodings, encodings=None):
+    """Escolhe a melhor codificação aceita pelo cliente (header Accept-Encoding), ou None."""
+    for encoding in encodings or available_encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=6):
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level, 11))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_response(response, app, encoded_cache=None):
+    """
+    Comprime o corpo de uma resposta em memória, se o cliente aceitar e valer a pena.
+    `encoded_cache` (dict codificação -> bytes) evita recomprimir corpos que não mudam.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    if encoded_cache is not None and encoding in encoded_cache:
+        body = encoded_cache[encoding]
+    else:
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+        body = compress(data, encoding, app.config.get('COMPRESS_LEVEL', 6))
+        if encoded_cache is not None:
+            encoded_cache[encoding] = body
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # O corpo comprimido não é idêntico byte a byte ao original: o ETag passa a ser fraco.
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _precompressed_static(app, filename):
+    """Caminho (relativo à pasta static) e codificação da melhor versão pré-comprimida, ou None."""
+    source = safe_join(app.static_folder, filename)
+    if source is None:
+        return None
+    try:
+        source_mtime = os.stat(source).st_mtime
+    except OSError:
+        return None
+    accepted = [encoding for encoding, _ in STATIC_ENCODINGS if request.accept_encodings[encoding]]
+    for encoding, extension in STATIC_ENCODINGS:
+        if encoding not in accepted:
+            continue
+        try:
+            # Uma versão comprimida mais antiga que o original está desatualizada.
+            if os.stat(source + extension).st_mtime >= source_mtime:
+                return filename + extension, encoding
+        except OSError:
+            continue
+    return None
+
+
+def precompress_static(static_folder, level=9, skip_dirs=('uploads',)):
+    """
+    Gera as versões .gz (e .br, se o brotli estiver instalado) dos arquivos estáticos
+    de texto. Arquivos já atualizados e compressões que não economizam nada são pulados.
+    Retorna a lista de arquivos gerados.
+    """
+    written = []
+    encodings = [(encoding, extension) for encoding, extension in STATIC_ENCODINGS
+                 if encoding in available_encodings()]
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.relpath(os.path.join(root, d), static_folder) not in skip_dirs]
+        for name in files:
+            if not name.endswith(PRECOMPRESS_EXTENSIONS):
+                continue
+            source = os.path.join(root, name)
+            data = None
+            for encoding, extension in encodings:
+                target = source + extension
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source):
+                    continue
+                if data is None:
+                    with open(source, 'rb') as file:
+                        data = file.read()
+                body = compress(data, encoding, level if encoding == 'gzip' else 11)
+                if len(body) >= len(data):
+                    if os.path.exists(target):
+                        os.remove(target)
+                    continue
+                with open(target, 'wb') as file:
+                    file.write(body)
+                written.append(target)
+    return written
+
+
+def init_compression(app):
+    """
+    Ativa a compressão na aplicação:
+      - respostas dinâmicas (HTML, JSON, ...) acima de COMPRESS_MIN_SIZE bytes são
+        comprimidas com brotli ou gzip, conforme o Accept-Encoding do cliente;
+      - arquivos estáticos com uma versão .br/.gz gerada por `flask compress-static`
+        são enviados já comprimidos, com cache de STATIC_MAX_AGE segundos.
+    """
+    @app.before_request
+    def serve_precompressed_static():
+        if request.endpoint != 'static' or request.method not in ('GET', 'HEAD'):
+            return None
+        filename = (request.view_args or {}).get('filename', '')
+        found = _precompressed_static(app, filename)
+        if found is None:
+            return None
+        compressed, encoding = found
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(app.static_folder, compressed, mimetype=mimetype,
+                                       max_age=app.config.get('STATIC_MAX_AGE'))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    @app.after_request
+    def compress_dynamic_response(response):
+        if request.endpoint == 'static' or not app.config.get('COMPRESS_RESPONSES', True):
+            return response
+        return compress_response(response, app)
+
+    @app.cli.command('compress-static')
+    @click.option('--level', default=9, show_default=True, help='Nível de compressão do gzip.')
+    def compress_static_command(level):
+        """Gera as versões .gz/.br dos arquivos CSS, JS e SVG da pasta static."""
+        written = precompress_static(app.static_folder, level=level)
+        click.echo(f"{len(written)} arquivo(s) comprimido(s).")
@@ -0,0 +1,716 @@
+import csv
+import io
+import os
+import copy
+import heapq
+import bisect
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager, ExitStack
+from app.models.user import User
+from app.models.product import Product
+from app.models.review import Review
+from app.models.filter import Filter
+from app.utils.safe_io import file_lock, atomic_write, append_durable
+from app.utils.storage_backend import StorageBackend, decode_rows, parse_visit
+
+USERS_FIELDNAMES = ['id', 'username', 'email', 'password_hash', 'role', 'profile_picture', 'date_joined', 'address', 'city', 'state', 'zip_code']
+PRODUCTS_FIELDNAMES = ['id', 'name', 'brand', 'price', 'status', 'images', 'description', 'specs', 'seller_id', 'filters', 'image_variants']
+REVIEWS_FIELDNAMES = ['id', 'rating', 'comment', 'media_url', 'date_posted', 'user_id', 'product_id']
+FILTERS_FIELDNAMES = ['id', 'name', 'type']
+VISITS_FIELDNAMES = ['timestamp', 'session_id']
+
+# Lotes de workers diferentes podem chegar ao log fora de ordem; a busca pelo início
+# da janela recua esta folga a mais para não perder visitas gravadas com atraso.
+VISITS_ORDER_SLACK = timedelta(minutes=10)
+VISITS_SEEK_BLOCK = 64 * 1024
+VISITS_PARTITION_FORMAT = '%Y-%m'
+
+
+def _read_csv(filepath, fieldnames):
+    """Lê um arquivo CSV e retorna uma lista de dicionários. Retorna lista vazia se não existir."""
+    if not os.path.exists(filepath):
+        try:
+            _ensure_file_exists(filepath, fieldnames)
+        except OSError:
+            pass  # A leitura segue vazia; o erro já foi registrado por _write_csv.
+        return []
+    try:
+        # A biblioteca csv.DictReader lida com aspas automaticamente
+        with open(filepath, mode='r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            return [row for row in reader if row]
+    except Exception as e:
+        print(f"Erro CRÍTICO ao ler o arquivo CSV {filepath}: {e}")
+        return []
+
+def _read_csv_header(filepath):
+    """Colunas do cabeçalho de um arquivo CSV, ou None se ele não existir."""
+    try:
+        with open(filepath, mode='r', newline='', encoding='utf-8') as file:
+            return next(csv.reader(file), [])
+    except OSError:
+        return None
+
+def _write_csv(filepath, data, fieldnames):
+    """
+    Escreve uma lista de dicionários em um arquivo CSV, sobrescrevendo o conteúdo.
+    Usa 'quoting=csv.QUOTE_ALL' para garantir que todos os campos sejam envolvidos por aspas,
+    resolvendo problemas com vírgulas e quebras de linha dentro dos campos.
+
+    A escrita é atômica: o conteúdo vai para um arquivo temporário que, após o fsync,
+    substitui o original. Uma queda no meio da escrita nunca deixa o CSV truncado.
+    Quem faz leitura-modificação-escrita deve segurar file_lock(filepath).
+    Erros de escrita são registrados e relançados: quem chamou não pode tratar como gravado.
+    """
+    try:
+        # Mudança principal aqui: Usamos QUOTE_ALL para evitar quebras
+        with atomic_write(filepath) as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+            writer.writeheader()
+            writer.writerows(data)
+    except Exception as e:
+        print(f"Erro CRÍTICO ao escrever no arquivo CSV {filepath}: {e}")
+        raise
+
+def _append_csv(filepath, row, fieldnames):
+    """
+    Acrescenta uma única linha ao final de um arquivo CSV, sem reescrever o restante.
+    Usa o mesmo dialeto (QUOTE_ALL) de _write_csv, para que o arquivo continue uniforme.
+    A linha é gravada com uma única chamada de escrita seguida de fsync. Erros são relançados.
+    """
+    _ensure_file_exists(filepath, fieldnames)
+    try:
+        buffer = io.StringIO()
+        with open(filepath, mode='rb') as file:
+            # Se o arquivo foi editado à mão e não termina em quebra de linha,
+            # a nova linha seria colada na anterior.
+            file.seek(0, os.SEEK_END)
+            if file.tell() > 0:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) not in (b'\n', b'\r'):
+                    buffer.write('\r\n')
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
+        writer.writerow(row)
+        append_durable(filepath, buffer.getvalue())
+    except Exception as e:
+        print(f"Erro CRÍTICO ao acrescentar no arquivo CSV {filepath}: {e}")
+        raise
+
+def _line_visit_time(line):
+    """Timestamp de uma linha crua do log de visitas, ou None se a linha for inválida."""
+    try:
+        row = next(csv.reader([line.decode('utf-8')]), None)
+    except (UnicodeDecodeError, csv.Error):
+        return None
+    visit = parse_visit(row[0], row[1]) if row and len(row) >= 2 else None
+    return visit[0] if visit else None
+
+def _visits_window_offset(raw, start_time, data_start):
+    """
+    Procura, lendo blocos de trás para frente a partir do fim do arquivo, o offset
+    de uma linha anterior a `start_time`. Como o log é acrescentado em ordem
+    cronológica, tudo antes dela está fora da janela. Retorna `data_start` se o
+    arquivo inteiro estiver dentro da janela.
+    """
+    position = raw.seek(0, os.SEEK_END)
+    while position > data_start:
+        position = max(data_start, position - VISITS_SEEK_BLOCK)
+        raw.seek(position)
+        block = raw.read(VISITS_SEEK_BLOCK)
+        line_start = position
+        if position != data_start:
+            # O bloco pode começar no meio de uma linha: usa a primeira linha completa.
+            newline = block.find(b'\n')
+            if newline < 0:
+                continue
+            line_start += newline + 1
+        raw.seek(line_start)
+        visit_time = _line_visit_time(raw.readline())
+        if visit_time is not None and visit_time < start_time:
+            return line_start
+    return data_start
+
+def _iter_visits_file(filepath, start_time=None):
+    """
+    Gera as visitas de um arquivo do log em streaming, sem montar a lista inteira.
+    Com `start_time`, começa pelo trecho final do arquivo que cobre a janela.
+    """
+    try:
+        raw = open(filepath, mode='rb')
+    except FileNotFoundError:
+        return
+    with raw:
+        header = raw.readline()
+        fieldnames = next(csv.reader([header.decode('utf-8-sig')]), VISITS_FIELDNAMES)
+        if start_time is not None:
+            raw.seek(_visits_window_offset(raw, start_time - VISITS_ORDER_SLACK, raw.tell()))
+        file = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+        for row in csv.DictReader(file, fieldnames=fieldnames):
+            visit = parse_visit(row.get('timestamp'), row.get('session_id'))
+            if visit is None:
+                continue
+            if start_time is None or visit[0] >= start_time:
+                yield visit
+
+def _next_month(moment):
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1)
+    return moment.replace(month=moment.month + 1)
+
+def _ensure_file_exists(filepath, fieldnames):
+    """Cria um arquivo CSV com o cabeçalho apropriado se ele não existir."""
+    if os.path.exists(filepath): return
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    _write_csv(filepath, [], fieldnames)
+
+def _sequence_path(filepath):
+    """Caminho do arquivo que guarda o maior ID já emitido para uma tabela (ex: users.seq)."""
+    return os.path.splitext(filepath)[0] + '.seq'
+
+def _read_sequence(filepath):
+    """Lê o maior ID já emitido para a tabela. Retorna 0 se ainda não houver registro."""
+    try:
+        with open(_sequence_path(filepath), 'r', encoding='utf-8') as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def _write_sequence(filepath, value):
+    try:
+        with atomic_write(_sequence_path(filepath)) as file:
+            file.write(str(value))
+    except OSError as e:
+        print(f"Erro ao gravar a sequência de IDs de {filepath}: {e}")
+
+def _file_signature(filepath):
+    """
+    Retorna (inode, mtime_ns, tamanho) do arquivo, ou None se ele não existir. As regravações
+    usam os.replace e criam um inode novo, então uma troca com o mesmo tamanho dentro da
+    resolução do mtime também é detectada.
+    """
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def _to_id(value):
+    """Normaliza um ID vindo de URL, sessão ou CSV para inteiro. Retorna None se inválido."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _review_order(review):
+    """Ordem das avaliações de um produto: data de publicação, com o ID desempatando."""
+    return (review.date_posted, review.id)
+
+
+# --- CACHE DE TABELAS EM MEMÓRIA ---
+
+class _TableCache:
+    """
+    Mantém em memória os objetos de modelo de uma tabela CSV, indexados por ID.
+
+    O conteúdo só é relido quando a assinatura do arquivo (inode, mtime e tamanho) muda,
+    o que cobre alterações feitas por outros processos ou manualmente no disco.
+    As funções de escrita do backend atualizam o cache e os índices diretamente.
+
+    Atributos:
+        by_id (dict): índice primário ID -> objeto. Como dicionários preservam a ordem
+            de inserção, ele também guarda a ordem das linhas no arquivo.
+        unique (dict): índices únicos secundários, no formato campo -> {valor: ID}.
+        groups (dict): índices não únicos, no formato campo -> {valor: {ID: None}}
+            (ex: produtos por status).
+        sorted_groups (dict): grupos mantidos em ordem de `sort_key`, no formato
+            (campos) -> {(valores): [(chave, ID), ...]} (ex: avaliações por produto e data),
+            para ler uma página a partir de qualquer posição com busca binária.
+    """
+    def __init__(self, filepath, fieldnames, model, unique_fields=(), group_fields=(), sorted_groups=(), sort_key=None):
+        self.filepath = filepath
+        self.fieldnames = fieldnames
+        self.model = model
+        self.signature = None
+        # False se o arquivo ainda tem o cabeçalho de uma versão anterior (ex: sem uma coluna
+        # nova); nesse caso a próxima inserção regrava o arquivo em vez de fazer append.
+        self.header_current = True
+        self.by_id = {}
+        # Maior ID visto neste arquivo; nunca diminui com exclusões.
+        self.max_id = 0
+        self.unique = {field: {} for field in unique_fields}
+        self.groups = {field: {} for field in group_fields}
+        self.sorted_groups = {fields: {} for fields in sorted_groups}
+        self.sort_key = sort_key
+        self.lock = threading.RLock()
+
+    def load(self, objects):
+        """Substitui todo o conteúdo do cache e reconstrói os índices."""
+        self.by_id = {}
+        self.max_id = 0
+        for field in self.unique:
+            self.unique[field] = {}
+        for field in self.groups:
+            self.groups[field] = {}
+        for fields in self.sorted_groups:
+            self.sorted_groups[fields] = {}
+        for obj in objects:
+            self.put(obj, keep_sorted=False)
+        # Ordenar cada lista uma vez no fim sai mais barato que inserir linha a linha na posição certa.
+        for index in self.sorted_groups.values():
+            for entries in index.values():
+                entries.sort()
+
+    def put(self, obj, keep_sorted=True):
+        """
+        Insere ou substitui um objeto, mantendo os índices sincronizados. Retorna True se era novo.
+        Com keep_sorted=False as listas de sorted_groups só recebem o item no fim (quem chama as ordena).
+        """
+        old = self.by_id.get(obj.id)
+        for field, index in self.unique.items():
+            if old is not None and index.get(getattr(old, field)) == old.id:
+                del index[getattr(old, field)]
+            index[getattr(obj, field)] = obj.id
+        for field, index in self.groups.items():
+            if old is not None:
+                self._ungroup(index, getattr(old, field), old.id)
+            index.setdefault(getattr(obj, field), {})[obj.id] = None
+        for fields, index in self.sorted_groups.items():
+            if old is not None:
+                self._unsort(index, fields, old, keep_sorted)
+            entries = index.setdefault(tuple(getattr(obj, field) for field in fields), [])
+            if keep_sorted:
+                bisect.insort(entries, (self.sort_key(obj), obj.id))
+            else:
+                entries.append((self.sort_key(obj), obj.id))
+        self.by_id[obj.id] = obj
+        if obj.id > self.max_id:
+            self.max_id = obj.id
+        return old is None
+
+    def remove(self, item_id):
+        """Remove o objeto com o ID informado. Retorna o objeto removido ou None."""
+        old = self.by_id.pop(item_id, None)
+        if old is not None:
+            for field, index in self.unique.items():
+                if index.get(getattr(old, field)) == old.id:
+                    del index[getattr(old, field)]
+            for field, index in self.groups.items():
+                self._ungroup(index, getattr(old, field), old.id)
+            for fields, index in self.sorted_groups.items():
+                self._unsort(index, fields, old)
+        return old
+
+    @staticmethod
+    def _ungroup(index, value, item_id):
+        ids = index.get(value)
+        if ids is not None:
+            ids.pop(item_id, None)
+            if not ids:
+                del index[value]
+
+    def _unsort(self, index, fields, obj, keep_sorted=True):
+        values = tuple(getattr(obj, field) for field in fields)
+        entries = index.get(values)
+        if entries is None:
+            return
+        entry = (self.sort_key(obj), obj.id)
+        if keep_sorted:
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+        elif entry in entries:
+            entries.remove(entry)
+        if not entries:
+            del index[values]
+
+    def find(self, field, value):
+        """Busca O(1) em um índice único. Retorna o objeto em cache ou None."""
+        item_id = self.unique[field].get(value)
+        return self.by_id.get(item_id) if item_id is not None else None
+
+    def find_all(self, field, value, limit=None):
+        """Objetos em cache com `field == value`, em ordem de ID, lidos de um índice de grupo."""
+        ids = self.groups[field].get(value, {})
+        ids = sorted(ids) if limit is None else heapq.nsmallest(limit, ids)
+        return [self.by_id[item_id] for item_id in ids]
+
+    def find_sorted(self, fields, values, before=None, limit=None):
+        """
+        Objetos de um grupo ordenado, do maior `sort_key` para o menor, começando pelo
+        primeiro com chave menor que `before` (cursor). Custa O(log n + limit).
+        """
+        entries = self.sorted_groups[fields].get(values, [])
+        end = len(entries) if before is None else bisect.bisect_left(entries, (before,))
+        start = 0 if limit is None else max(0, end - limit)
+        return [self.by_id[item_id] for _, item_id in reversed(entries[start:end])]
+
+    def refresh_signature(self):
+        """Registra a assinatura atual do arquivo após uma escrita feita por este processo."""
+        self.signature = _file_signature(self.filepath)
+
+
+class CSVBackend(StorageBackend):
+    """
+    Backend original: uma tabela por arquivo CSV em `data_folder`.
+
+    Cada tabela fica em cache na memória (_TableCache) e só é relida quando o
+    arquivo muda no disco. Inserções são feitas por append, atualizações e
+    exclusões reescrevem o arquivo de forma atômica, sempre sob file_lock.
+    """
+
+    name = 'csv'
+
+    def __init__(self, data_folder):
+        self.data_folder = data_folder
+        self.users_csv = os.path.join(data_folder, 'users.csv')
+        self.products_csv = os.path.join(data_folder, 'products.csv')
+        self.reviews_csv = os.path.join(data_folder, 'reviews.csv')
+        self.filters_csv = os.path.join(data_folder, 'filters.csv')
+        self.visits_csv = os.path.join(data_folder, 'visits.csv')
+        self.visits_folder = os.path.join(data_folder, 'visits')
+        self._legacy_migrated = False
+        self.tables = {
+            'users': _TableCache(self.users_csv, USERS_FIELDNAMES, User, unique_fields=('email', 'username')),
+            'products': _TableCache(self.products_csv, PRODUCTS_FIELDNAMES, Product, group_fields=('status',)),
+            'reviews': _TableCache(
+                self.reviews_csv, REVIEWS_FIELDNAMES, Review,
+                sorted_groups=(('product_id',), ('product_id', 'rating')), sort_key=_review_order
+            ),
+            'filters': _TableCache(self.filters_csv, FILTERS_FIELDNAMES, Filter),
+        }
+
+    # --- INFRAESTRUTURA DO CACHE ---
+
+    def _load_table(self, name):
+        """Retorna o cache da tabela, recarregando o CSV apenas se o arquivo mudou no disco."""
+        table = self.tables[name]
+        with table.lock:
+            signature = _file_signature(table.filepath)
+            if signature is None or signature != table.signature:
+                rows = _read_csv(table.filepath, table.fieldnames)
+                table.load(decode_rows(table.model, rows))
+                table.header_current = _read_csv_header(table.filepath) in (None, table.fieldnames)
+                # A assinatura é a de antes da leitura: se outro processo escreveu durante
+                # a leitura, a próxima chamada percebe a diferença e recarrega.
+                table.signature = signature if signature is not None else _file_signature(table.filepath)
+            return table
+
+    @contextmanager
+    def _locked_table(self, name):
+        """
+        Segura o lock do arquivo (entre processos) e o da tabela em cache durante um ciclo de
+        leitura-modificação-escrita. O cache é revalidado já com o lock, de modo que a
+        escrita parte sempre do conteúdo mais recente do disco.
+        """
+        table = self.tables[name]
+        with file_lock(table.filepath):
+            with table.lock:
+                yield self._load_table(name)
+
+    def _cached_items(self, name):
+        """Retorna cópias dos objetos em cache, para que o chamador possa alterá-los livremente."""
+        table = self._load_table(name)
+        with table.lock:
+            items = list(table.by_id.values())
+        return [copy.copy(item) for item in items]
+
+    def _cached_by_id(self, name, item_id):
+        """Busca O(1) pelo ID no índice primário. Retorna uma cópia do objeto ou None."""
+        table = self._load_table(name)
+        with table.lock:
+            item = table.by_id.get(_to_id(item_id))
+        return copy.copy(item) if item is not None else None
+
+    def _cached_by_unique(self, name, field, value):
+        """Busca O(1) em um índice único secundário. Retorna uma cópia do objeto ou None."""
+        table = self._load_table(name)
+        with table.lock:
+            item = table.find(field, value)
+        return copy.copy(item) if item is not None else None
+
+    def _write_table(self, table):
+        """
+        Regrava o CSV a partir dos objetos em cache e atualiza a assinatura. Se a escrita
+        falhar, o cache (que já tem a alteração) é invalidado para ser relido do disco na
+        próxima consulta, e o erro chega a quem chamou.
+        """
+        try:
+            _write_csv(table.filepath, [item.to_dict() for item in table.by_id.values()], table.fieldnames)
+        except Exception:
+            table.signature = None
+            raise
+        table.header_current = True
+        table.refresh_signature()
+
+    def _append_to_table(self, table, obj):
+        """
+        Caminho de inserção O(1): acrescenta a linha ao CSV e, só depois de gravada, ao cache,
+        sem reescrever o arquivo.
+        """
+        if not table.header_current:
+            table.put(copy.copy(obj))
+            self._write_table(table)
+            return
+        try:
+            _append_csv(table.filepath, obj.to_dict(), table.fieldnames)
+        except Exception:
+            # O append pode ter gravado parte da linha: o cache é relido do disco.
+            table.signature = None
+            raise
+        table.put(copy.copy(obj))
+        table.refresh_signature()
+
+    def _allocate_id(self, table):
+        """
+        Reserva o próximo ID da tabela e o persiste no arquivo de sequência,
+        para que IDs de registros excluídos nunca sejam reaproveitados.
+        """
+        new_id = max(table.max_id, _read_sequence(table.filepath)) + 1
+        _write_sequence(table.filepath, new_id)
+        return new_id
+
+    def _bump_sequence(self, table, item_id):
+        """Garante que a sequência persistida acompanhe IDs informados explicitamente."""
+        if item_id > _read_sequence(table.filepath):
+            _write_sequence(table.filepath, item_id)
+
+    def _delete(self, name, item_id):
+        with self._locked_table(name) as table:
+            if table.remove(_to_id(item_id)) is not None:
+                self._write_table(table)
+                return True
+        return False
+
+    @contextmanager
+    def write_lock(self, *tables):
+        # Ordem fixa de aquisição: dois blocos com as mesmas tabelas nunca se travam.
+        with ExitStack() as stack:
+            for name in sorted(set(tables)):
+                stack.enter_context(self._locked_table(name))
+            yield
+
+    def table_version(self, table):
+        return _file_signature(self.tables[table].filepath)
+
+    def next_id(self, table):
+        return max(self._load_table(table).max_id, _read_sequence(self.tables[table].filepath)) + 1
+
+    # --- USUÁRIOS ---
+
+    def get_users(self):
+        return self._cached_items('users')
+
+    def get_user_by_id(self, user_id):
+        return self._cached_by_id('users', user_id)
+
+    def get_user_by_email(self, email):
+        return self._cached_by_unique('users', 'email', email)
+
+    def get_user_by_username(self, username):
+        return self._cached_by_unique('users', 'username', username)
+
+    def email_exists(self, email):
+        table = self._load_table('users')
+        with table.lock:
+            return email in table.unique['email']
+
+    def save_user(self, user):
+        with self._locked_table('users') as table:
+            user.id = _to_id(user.id)
+            if user.id in table.by_id:
+                table.put(copy.copy(user))
+                self._write_table(table)
+            else:
+                user.id = self._allocate_id(table)
+                self._append_to_table(table, user)
+
+    # --- PRODUTOS ---
+
+    def get_products(self):
+        return self._cached_items('products')
+
+    def get_product_by_id(self, product_id):
+        return self._cached_by_id('products', product_id)
+
+    def get_products_by_status(self, status, limit=None):
+        table = self._load_table('products')
+        with table.lock:
+            items = table.find_all('status', status, limit)
+        return [copy.copy(item) for item in items]
+
+    def save_product(self, product):
+        with self._locked_table('products') as table:
+            if product.id is None:
+                product.id = self._allocate_id(table)
+                self._append_to_table(table, product)
+            elif _to_id(product.id) in table.by_id:
+                product.id = _to_id(product.id)
+                table.put(copy.copy(product))
+                self._write_table(table)
+            else:
+                product.id = _to_id(product.id)
+                self._bump_sequence(table, product.id)
+                self._append_to_table(table, product)
+        return product
+
+    def update_product(self, product_id, update):
+        with self._locked_table('products') as table:
+            cached = table.by_id.get(_to_id(product_id))
+            if cached is None:
+                return None
+            product = copy.copy(cached)
+            if update(product) is False:
+                return product
+            table.put(copy.copy(product))
+            self._write_table(table)
+        return product
+
+    def delete_product(self, product_id):
+        return self._delete('products', product_id)
+
+    # --- FILTROS ---
+
+    def get_filters(self):
+        return self._cached_items('filters')
+
+    def get_filter_by_id(self, filter_id):
+        return self._cached_by_id('filters', filter_id)
+
+    def save_filter(self, filter_obj):
+        with self._locked_table('filters') as table:
+            filter_obj.id = self._allocate_id(table)
+            self._append_to_table(table, filter_obj)
+
+    def delete_filter(self, filter_id):
+        return self._delete('filters', filter_id)
+
+    # --- AVALIAÇÕES ---
+
+    def get_reviews(self):
+        return self._cached_items('reviews')
+
+    def get_review_by_id(self, review_id):
+        return self._cached_by_id('reviews', review_id)
+
+    def get_reviews_by_product(self, product_id):
+        return self.get_reviews_page(product_id, limit=None)
+
+    def get_reviews_page(self, product_id, before=None, rating=None, limit=20):
+        # Lê só a fatia da página na lista do produto (ou do produto e nota), já ordenada por data.
+        fields, values = (('product_id',), (_to_id(product_id),)) if rating is None else \
+            (('product_id', 'rating'), (_to_id(product_id), rating))
+        table = self._load_table('reviews')
+        with table.lock:
+            items = table.find_sorted(fields, values, before, limit)
+        return [copy.copy(item) for item in items]
+
+    def save_review(self, review):
+        with self._locked_table('reviews') as table:
+            review.id = _to_id(review.id)
+            if review.id in table.by_id:
+                table.put(copy.copy(review))
+                self._write_table(table)
+            else:
+                review.id = self._allocate_id(table)
+                self._append_to_table(table, review)
+        return review
+
+    def delete_review(self, review_id):
+        return self._delete('reviews', review_id)
+
+    # --- VISITAS ---
+    # O log de visitas é particionado por mês (visits/AAAA-MM.csv): as consultas abrem
+    # só as partições que cruzam a janela e a retenção apaga partições inteiras.
+
+    def _visits_partition(self, moment):
+        return os.path.join(self.visits_folder, moment.strftime(VISITS_PARTITION_FORMAT) + '.csv')
+
+    def _visit_partitions(self):
+        """Lista ordenada de (início do mês, fim do mês, caminho) das partições existentes."""
+        self._migrate_legacy_visits()
+        partitions = []
+        try:
+            names = os.listdir(self.visits_folder)
+        except FileNotFoundError:
+            return partitions
+        for name in names:
+            stem, extension = os.path.splitext(name)
+            if extension != '.csv':
+                continue
+            try:
+                month_start = datetime.strptime(stem, VISITS_PARTITION_FORMAT)
+            except ValueError:
+                continue
+            partitions.append((month_start, _next_month(month_start), os.path.join(self.visits_folder, name)))
+        partitions.sort()
+        return partitions
+
+    def _migrate_legacy_visits(self):
+        """
+        Distribui o antigo visits.csv (arquivo único) pelas partições mensais e o remove.
+        Se a migração for interrompida, ela recomeça do início na próxima chamada; as
+        linhas repetidas não alteram as contagens, que são de sessões distintas.
+        """
+        if self._legacy_migrated or not os.path.exists(self.visits_csv):
+            self._legacy_migrated = True
+            return
+        with file_lock(self.visits_csv):
+            if os.path.exists(self.visits_csv):
+                batch = []
+                for visit in _iter_visits_file(self.visits_csv):
+                    batch.append(visit)
+                    if len(batch) >= 10000:
+                        self._append_visits(batch)
+                        batch = []
+                self._append_visits(batch)
+                os.remove(self.visits_csv)
+        self._legacy_migrated = True
+
+    def _append_visits(self, visits):
+        by_partition = {}
+        for visit_time, session_id in visits:
+            by_partition.setdefault(self._visits_partition(visit_time), []).append(
+                {'timestamp': visit_time.isoformat(), 'session_id': session_id})
+        for path, rows in by_partition.items():
+            buffer = io.StringIO()
+            csv.DictWriter(buffer, fieldnames=VISITS_FIELDNAMES).writerows(rows)
+            # Todos os workers acrescentam nestes arquivos; o lock evita linhas intercaladas.
+            with file_lock(path):
+                _ensure_file_exists(path, VISITS_FIELDNAMES)
+                append_durable(path, buffer.getvalue())
+
+    def register_visits(self, visits):
+        self._migrate_legacy_visits()
+        self._append_visits(visits)
+
+    def iter_visits(self, start_time=None, end_time=None):
+        """
+        Lê o log de visitas em streaming, abrindo apenas as partições que cruzam a janela.
+        Na primeira partição, a leitura começa pelo trecho que cobre `start_time`
+        (ver _visits_window_offset).
+        """
+        for month_start, month_end, path in self._visit_partitions():
+            if start_time is not None and month_end <= start_time:
+                continue
+            if end_time is not None and month_start >= end_time:
+                break
+            seek_to = start_time if start_time is not None and start_time > month_start else None
+            for visit in _iter_visits_file(path, seek_to):
+                if end_time is None or visit[0] < end_time:
+                    yield visit
+
+    def purge_visits(self, before):
+        removed = 0
+        for month_start, month_end, path in self._visit_partitions():
+            if month_end > before:
+                break
+            with file_lock(path):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+            # O arquivo .lock fica: apagá-lo deixaria um processo que já o abriu
+            # travando um inode órfão enquanto outro cria um lock novo no mesmo caminho.
+        return removed
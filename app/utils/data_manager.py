@@ -1,12 +1,19 @@
-import csv
 import os
-import json
-from datetime import datetime, timedelta
+import threading
 from collections import Counter
-from app.models.user import User
-from app.models.product import Product
-from app.models.review import Review
-from app.models.filter import Filter
+from datetime import datetime, timedelta
+from app.utils.storage_backend import StorageBackend
+from app.utils.visit_recorder import VisitRecorder
+from app.utils.visit_rollups import VisitRollups
+from app.utils.search_index import ProductSearchIndex
+from app.utils.facet_index import FacetIndex
+from app.utils.catalog_snapshot import CatalogSnapshot
+from app.utils.review_stats import ReviewStats
+from app.utils.blob_store import BlobStore
+from app.utils.csv_backend import (
+    CSVBackend, USERS_FIELDNAMES, PRODUCTS_FIELDNAMES, REVIEWS_FIELDNAMES,
+    FILTERS_FIELDNAMES, VISITS_FIELDNAMES
+)
 
 DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'banco_de_dados')
 USERS_CSV = os.path.join(DATA_FOLDER, 'users.csv')
@@ -14,234 +21,551 @@ PRODUCTS_CSV = os.path.join(DATA_FOLDER, 'products.csv')
 REVIEWS_CSV = os.path.join(DATA_FOLDER, 'reviews.csv')
 FILTERS_CSV = os.path.join(DATA_FOLDER, 'filters.csv')
 VISITS_CSV = os.path.join(DATA_FOLDER, 'visits.csv')
-USERS_FIELDNAMES = ['id', 'username', 'email', 'password_hash', 'role', 'profile_picture', 'date_joined', 'address', 'city', 'state', 'zip_code']
-PRODUCTS_FIELDNAMES = ['id', 'name', 'brand', 'price', 'status', 'images', 'description', 'specs', 'seller_id', 'filters']
-REVIEWS_FIELDNAMES = ['id', 'rating', 'comment', 'media_url', 'date_posted', 'user_id', 'product_id']
-FILTERS_FIELDNAMES = ['id', 'name', 'type']
-VISITS_FIELDNAMES = ['timestamp', 'session_id']
-
-def _read_csv(filepath):
-    """Lê um arquivo CSV e retorna uma lista de dicionários. Retorna lista vazia se não existir."""
-    if not os.path.exists(filepath):
-        _ensure_file_exists(filepath)
-        return []
-    try:
-        # A biblioteca csv.DictReader lida com aspas automaticamente
-        with open(filepath, mode='r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)       
-            return [row for row in reader if row]
-    except Exception as e:
-        print(f"Erro CRÍTICO ao ler o arquivo CSV {filepath}: {e}")
-        return []
+VISITS_FOLDER = os.path.join(DATA_FOLDER, 'visits')
+VISIT_ROLLUPS_FOLDER = os.path.join(DATA_FOLDER, 'visit_rollups')
 
-def _write_csv(filepath, data, fieldnames):
-    """
-    Escreve uma lista de dicionários em um arquivo CSV, sobrescrevendo o conteúdo.
-    Usa 'quoting=csv.QUOTE_ALL' para garantir que todos os campos sejam envolvidos por aspas,
-    resolvendo problemas com vírgulas e quebras de linha dentro dos campos.
-    """
-    try:
-        # Mudança principal aqui: Usamos QUOTE_ALL para evitar quebras
-        with open(filepath, mode='w', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=fieldnames, quoting=csv.QUOTE_ALL)
-            writer.writeheader()
-            writer.writerows(data)
-    except Exception as e:
-        print(f"Erro CRÍTICO ao escrever no arquivo CSV {filepath}: {e}")
+# --- BACKEND DE ARMAZENAMENTO ---
+# As funções públicas deste módulo são a única porta de acesso aos dados usada pelas
+# rotas. Elas delegam para o backend configurado em config.Config.STORAGE_BACKEND.
+
+_backend = None
+_backend_lock = threading.Lock()
+# Fila de visitas gravada em lote em segundo plano; None grava de forma síncrona.
+_visit_recorder = None
+# Agregados de sessões por hora/dia/semana/mês/ano; None consulta o log bruto.
+_visit_rollups = None
+# Modo padrão das contagens de visitas: exato (conjuntos) ou aproximado (HyperLogLog).
+_visits_approximate = False
+# Retenção do log bruto (meses) e dos buckets por hora (dias); 0 mantém tudo.
+_visits_retention = {'months': 0, 'hourly_days': 0}
+_last_compaction = None
+# Índices derivados do catálogo (busca e facetas): atualizados de forma incremental pelas
+# escritas deste processo e reconstruídos quando o catálogo muda em outro processo.
+_search_index = ProductSearchIndex()
+_facet_index = FacetIndex()
+# Cópia colunar (arrays) de IDs, preços, status e filtros, para listar, ordenar e contar.
+_catalog_snapshot = CatalogSnapshot()
+# Média, quantidade e histograma das avaliações de cada produto, mantidos da mesma forma.
+_review_stats = ReviewStats()
+# Arquivos enviados (imagens de produtos, fotos de perfil), endereçados pelo conteúdo.
+# None (scripts sem init_app) desativa a contagem de referências.
+_blob_store = None
+
+def create_backend(name, sqlite_database=None):
+    """Instancia o backend de armazenamento pelo nome ('csv' ou 'sqlite')."""
+    if name == 'csv':
+        return CSVBackend(DATA_FOLDER)
+    if name == 'sqlite':
+        from app.utils.sqlite_backend import SQLiteBackend
+        # Na primeira execução com SQLite, os dados existentes nos CSVs são importados.
+        return SQLiteBackend(sqlite_database, import_from=CSVBackend(DATA_FOLDER))
+    raise ValueError(f"Backend de armazenamento desconhecido: {name}")
+
+def set_backend(backend):
+    """Substitui o backend em uso (útil para testes e scripts)."""
+    global _backend
+    if not isinstance(backend, StorageBackend):
+        raise TypeError("O backend deve herdar de StorageBackend.")
+    _backend = backend
+    _search_index.clear()
+    _facet_index.clear()
+    _catalog_snapshot.clear()
+    _review_stats.clear()
+
+def init_app(app):
+    """Configura o backend e o registro de visitas a partir das configurações da aplicação Flask."""
+    set_backend(create_backend(app.config.get('STORAGE_BACKEND', 'csv'), app.config.get('SQLITE_DATABASE')))
+    global _visits_approximate
+    if app.config.get('VISITS_ROLLUPS', True):
+        set_visit_rollups(VisitRollups(
+            VISIT_ROLLUPS_FOLDER,
+            hll_error=app.config.get('VISITS_HLL_ERROR', 0.02),
+            keep_exact=app.config.get('VISITS_EXACT_ROLLUPS', True),
+        ))
+    else:
+        set_visit_rollups(None)
+    _visits_approximate = app.config.get('VISITS_APPROXIMATE', False)
+    if app.config.get('BLOB_FOLDER'):
+        set_blob_store(BlobStore(app.config['BLOB_FOLDER'], app.config.get('BLOB_URL_PREFIX', '/static/uploads/blobs')))
+    _visits_retention['months'] = app.config.get('VISITS_RETENTION_MONTHS', 0)
+    _visits_retention['hourly_days'] = app.config.get('VISITS_HOURLY_RETENTION_DAYS', 0)
+    if app.config.get('VISITS_BUFFERED', True):
+        set_visit_recorder(VisitRecorder(
+            _store_visits,
+            batch_size=app.config.get('VISITS_FLUSH_SIZE', 100),
+            flush_interval=app.config.get('VISITS_FLUSH_INTERVAL', 2.0),
+        ))
+    else:
+        set_visit_recorder(None)
+
+def get_backend():
+    """Retorna o backend em uso, criando-o a partir de config.Config se ainda não houver um."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                from config import Config
+                _backend = create_backend(Config.STORAGE_BACKEND, Config.SQLITE_DATABASE)
+    return _backend
+
+_TABLE_BY_PATH = {USERS_CSV: 'users', PRODUCTS_CSV: 'products', REVIEWS_CSV: 'reviews', FILTERS_CSV: 'filters'}
 
 def get_next_id(filepath):
     """Calcula o próximo ID disponível para um novo registro."""
-    data = _read_csv(filepath)
-    if not data: return 1
-    # Garante que o ID seja tratado como um inteiro, mesmo se for uma string no CSV
-    return max(int(row.get('id', 0)) for row in data) + 1
-
-def _ensure_file_exists(filepath):
-    """Cria um arquivo CSV com o cabeçalho apropriado se ele não existir."""
-    if os.path.exists(filepath): return
-    filename_map = {
-        USERS_CSV: USERS_FIELDNAMES, PRODUCTS_CSV: PRODUCTS_FIELDNAMES,
-        REVIEWS_CSV: REVIEWS_FIELDNAMES, FILTERS_CSV: FILTERS_FIELDNAMES,
-        VISITS_CSV: VISITS_FIELDNAMES,
-    }
-    fieldnames = filename_map.get(filepath)
-    if fieldnames:
-        os.makedirs(DATA_FOLDER, exist_ok=True)
-        _write_csv(filepath, [], fieldnames)
+    return get_backend().next_id(_TABLE_BY_PATH[filepath])
+
+
+# --- FUNÇÕES DE LEITURA ---
 
 def get_users():
     """Retorna uma lista de todos os usuários como objetos User."""
-    return [User.from_dict(row) for row in _read_csv(USERS_CSV)]
+    return get_backend().get_users()
 
 def get_products():
     """Retorna uma lista de todos os produtos como objetos Product."""
-    return [Product.from_dict(row) for row in _read_csv(PRODUCTS_CSV)]
+    return get_backend().get_products()
 
 def get_filters():
     """Retorna uma lista de todos os filtros como objetos Filter."""
-    return [Filter.from_dict(row) for row in _read_csv(FILTERS_CSV)]
+    return get_backend().get_filters()
 
 def get_user_by_id(user_id):
     """Busca um usuário pelo ID."""
-    for row in _read_csv(USERS_CSV):
-        if str(row.get('id')) == str(user_id):
-            return User.from_dict(row)
-    return None
+    return get_backend().get_user_by_id(user_id)
 
 def get_product_by_id(product_id):
     """Busca um produto pelo ID."""
-    for row in _read_csv(PRODUCTS_CSV):
-        if str(row.get('id')) == str(product_id):
-            return Product.from_dict(row)
-    return None
+    return get_backend().get_product_by_id(product_id)
+
+def get_products_by_status(status, limit=None):
+    """Busca os produtos de um status (ex: 'Em destaque') por um índice secundário, sem varrer o catálogo."""
+    return get_backend().get_products_by_status(status, limit)
+
+def get_filter_by_id(filter_id):
+    """Busca um filtro pelo ID."""
+    return get_backend().get_filter_by_id(filter_id)
+
+def get_products_by_ids(product_ids):
+    """Busca vários produtos pelo ID, na ordem informada, ignorando IDs inexistentes."""
+    products = (get_product_by_id(product_id) for product_id in product_ids)
+    return [product for product in products if product is not None]
+
+def get_review_by_id(review_id):
+    """Busca uma avaliação pelo ID."""
+    return get_backend().get_review_by_id(review_id)
+
+def get_reviews_by_product(product_id):
+    """Avaliações de um produto, da mais recente para a mais antiga, lidas pelo índice por produto."""
+    return get_backend().get_reviews_by_product(product_id)
+
+def get_reviews_page(product_id, before=None, rating=None, limit=20):
+    """
+    Uma página das avaliações de um produto, da mais recente para a mais antiga, a partir
+    do cursor `before` (a tupla (date_posted, id) da última avaliação da página anterior),
+    opcionalmente só as com a nota `rating`. Lida das listas por produto já ordenadas por data.
+    """
+    return get_backend().get_reviews_page(product_id, before, rating, limit)
 
 def get_user_by_email(email):
     """Busca um usuário pelo email."""
-    for row in _read_csv(USERS_CSV):
-        if row.get('email') == email:
-            return User.from_dict(row)
-    return None
+    return get_backend().get_user_by_email(email)
+
+def get_user_by_username(username):
+    """Busca um usuário pelo nome de usuário."""
+    return get_backend().get_user_by_username(username)
+
+def email_exists(email):
+    """Verifica em O(1) se já existe um usuário cadastrado com o email informado."""
+    return get_backend().email_exists(email)
+
+
+# --- FUNÇÕES DE ESCRITA ---
 
 def save_user(user):
     """Salva um novo usuário ou atualiza um existente."""
-    users_data = _read_csv(USERS_CSV)
-    user_dict = user.to_dict()
-    user_found = False
-    for i, u in enumerate(users_data):
-        if str(u.get('id')) == str(user.id):
-            users_data[i] = user_dict
-            user_found = True
-            break
-    if not user_found:
-        user.id = get_next_id(USERS_CSV)
-        users_data.append(user.to_dict())
-    _write_csv(USERS_CSV, users_data, USERS_FIELDNAMES)
+    old = get_user_by_id(user.id) if user.id is not None else None
+    _with_blob_references(
+        [old.profile_picture] if old else [], [user.profile_picture],
+        lambda: get_backend().save_user(user)
+    )
 
 def save_product(product):
     """Salva um novo produto ou atualiza um existente. Retorna o produto salvo."""
-    products_data = _read_csv(PRODUCTS_CSV)
-    product_found = False
-
-    if product.id is not None:
-        for i, p in enumerate(products_data):
-            if str(p.get('id')) == str(product.id):
-                products_data[i] = product.to_dict()
-                product_found = True
-                break
-    
-    if not product_found:
-        if product.id is None: 
-            product.id = get_next_id(PRODUCTS_CSV)
-        products_data.append(product.to_dict())
-
-    _write_csv(PRODUCTS_CSV, products_data, PRODUCTS_FIELDNAMES)
-    return product 
-    
+    def write():
+        old = get_product_by_id(product.id) if product.id is not None else None
+        return _with_blob_references(
+            old.images if old else [], product.images,
+            lambda: get_backend().save_product(product)
+        )
+    saved, before, after = _locked_write(CATALOG_TABLES, write)
+    _apply_to_index(_search_index, before, after, lambda index: index.index_product(saved, _filter_names_by_id()))
+    _apply_to_index(_facet_index, before, after, lambda index: index.index_product(saved))
+    _apply_to_index(_catalog_snapshot, before, after, lambda snapshot: snapshot.index_product(saved))
+    return saved
+
+def set_image_variants(product_id, variants):
+    """
+    Registra as larguras geradas para imagens do produto (URL -> [larguras]).
+    Imagens que deixaram de ser do produto enquanto eram processadas são ignoradas.
+    A leitura e a gravação acontecem com o lock da tabela (backend.update_product),
+    então uma edição do admin feita durante o processamento não é sobrescrita.
+    """
+    def merge(product):
+        current = {url: widths for url, widths in variants.items() if url in product.images}
+        if not current:
+            return False
+        product.image_variants = {
+            **{url: widths for url, widths in product.image_variants.items() if url in product.images},
+            **current,
+        }
+
+    saved, before, after = _locked_write(CATALOG_TABLES, lambda: get_backend().update_product(product_id, merge))
+    # As variantes não entram na busca, nas facetas nem na cópia colunar.
+    _apply_to_index(_search_index, before, after, lambda index: None)
+    _apply_to_index(_facet_index, before, after, lambda index: None)
+    _apply_to_index(_catalog_snapshot, before, after, lambda snapshot: None)
+    return saved
+
 def delete_product(product_id):
     """Deleta um produto pelo ID."""
-    products_data = _read_csv(PRODUCTS_CSV)
-    original_len = len(products_data)
-    products_to_keep = [p for p in products_data if str(p.get('id')) != str(product_id)]
-    if len(products_to_keep) < original_len:
-        _write_csv(PRODUCTS_CSV, products_to_keep, PRODUCTS_FIELDNAMES)
-        return True
-    return False
+    def write():
+        old = get_product_by_id(product_id)
+        return _with_blob_references(old.images if old else [], [], lambda: get_backend().delete_product(product_id))
+    deleted, before, after = _locked_write(CATALOG_TABLES, write)
+    _apply_to_index(_search_index, before, after, lambda index: index.remove_product(int(product_id)))
+    _apply_to_index(_facet_index, before, after, lambda index: index.remove_product(int(product_id)))
+    _apply_to_index(_catalog_snapshot, before, after, lambda snapshot: snapshot.remove_product(int(product_id)))
+    return deleted
 
 def save_filter(filter_obj):
     """Salva um novo filtro."""
-    filters_data = _read_csv(FILTERS_CSV)
-    filter_obj.id = get_next_id(FILTERS_CSV)
-    filters_data.append(filter_obj.to_dict())
-    _write_csv(FILTERS_CSV, filters_data, FILTERS_FIELDNAMES)
+    _, before, after = _locked_write(CATALOG_TABLES, lambda: get_backend().save_filter(filter_obj))
+    # Nenhum produto usa um filtro recém-criado, então o índice de busca não muda.
+    _apply_to_index(_search_index, before, after, lambda index: None)
+    _apply_to_index(_facet_index, before, after, lambda index: index.set_filter(filter_obj))
+    _apply_to_index(_catalog_snapshot, before, after, lambda snapshot: None)
 
 def delete_filter(filter_id):
     """Deleta um filtro pelo ID."""
-    filters_data = _read_csv(FILTERS_CSV)
-    original_len = len(filters_data)
-    filters_to_keep = [f for f in filters_data if str(f.get('id')) != str(filter_id)]
-    if len(filters_to_keep) < original_len:
-        _write_csv(FILTERS_CSV, filters_to_keep, FILTERS_FIELDNAMES)
-        return True
-    return False
+    deleted, before, after = _locked_write(CATALOG_TABLES, lambda: get_backend().delete_filter(filter_id))
+    # O nome do filtro está nos documentos do índice de busca: ele é reconstruído na próxima busca.
+    _apply_to_index(_facet_index, before, after, lambda index: index.remove_filter(int(filter_id)))
+    # Os produtos continuam com o ID do filtro excluído, então a cópia colunar não muda.
+    _apply_to_index(_catalog_snapshot, before, after, lambda snapshot: None)
+    return deleted
+
+
+# --- ARQUIVOS ENVIADOS (BLOBS) ---
+
+def set_blob_store(store):
+    """Define o armazenamento de arquivos enviados (None desativa a contagem de referências)."""
+    global _blob_store
+    _blob_store = store
+
+def store_upload(file_storage):
+    """
+    Grava um arquivo enviado no armazenamento por conteúdo e retorna a sua URL (a referência guardada nos modelos).
+    Os blobs são públicos: fotos perdem os metadados (EXIF, GPS, ...) antes do hash.
+    """
+    # Import tardio: o image_pipeline importa este módulo.
+    from app.utils.image_pipeline import strip_metadata
+    store = _blob_store
+    if store is None:
+        raise RuntimeError("Armazenamento de arquivos não configurado (BLOB_FOLDER).")
+    return store.url(store.put(file_storage, prepare=strip_metadata))
+
+def blob_path(url):
+    """Caminho no disco do blob referenciado pela URL, ou None se ela não for de um blob."""
+    name = _blob_store.name_from_url(url) if _blob_store is not None else None
+    return _blob_store.path(name) if name else None
+
+def _with_blob_references(old_urls, new_urls, write):
+    """
+    Executa `write` (a gravação de um registro) mantendo as contagens de referências
+    dos blobs: as novas referências são somadas antes, para que uma falha na gravação
+    nunca apague um arquivo em uso, e as que deixaram de existir são descontadas depois
+    (apagando os blobs que ficaram sem uso).
+    """
+    if _blob_store is None:
+        return write()
+    old = Counter(_blob_store.names_from_urls(old_urls))
+    new = Counter(_blob_store.names_from_urls(new_urls))
+    added, removed = list((new - old).elements()), list((old - new).elements())
+    _blob_store.update_references(added=added)
+    try:
+        result = write()
+    except Exception:
+        _blob_store.update_references(removed=added)
+        raise
+    if result is not False:
+        _blob_store.update_references(removed=removed)
+    return result
+
+def collect_blob_garbage():
+    """Recalcula as referências a partir de produtos e usuários e apaga os blobs sem uso."""
+    if _blob_store is None:
+        return []
+    urls = [url for product in get_products() for url in product.images]
+    urls += [user.profile_picture for user in get_users()]
+    return _blob_store.collect_garbage(_blob_store.names_from_urls(urls))
+
+
+# --- AVALIAÇÕES ---
+
+def get_reviews_version():
+    """Valor que muda sempre que uma avaliação é criada, alterada ou excluída, por qualquer processo."""
+    return get_backend().table_version('reviews')
+
+def save_review(review):
+    """Salva uma nova avaliação ou atualiza uma existente, atualizando a média do produto. Retorna a avaliação."""
+    def write():
+        old = get_review_by_id(review.id) if review.id is not None else None
+        return old, get_backend().save_review(review)
+    (old, saved), before, after = _locked_write(('reviews',), write, get_reviews_version)
+
+    def update(stats):
+        if old is not None:
+            stats.remove(old)
+        stats.add(saved)
+    _apply_to_index(_review_stats, before, after, update)
+    return saved
+
+def delete_review(review_id):
+    """Deleta uma avaliação pelo ID."""
+    def write():
+        old = get_review_by_id(review_id)
+        return old, get_backend().delete_review(review_id)
+    (old, deleted), before, after = _locked_write(('reviews',), write, get_reviews_version)
+    if deleted and old is not None:
+        _apply_to_index(_review_stats, before, after, lambda stats: stats.remove(old))
+    return deleted
+
+def _refresh_review_stats():
+    version = get_reviews_version()
+    if _review_stats.version != version:
+        _review_stats.rebuild(get_backend().get_rating_counts(), version)
+
+def get_rating_summary(product_id):
+    """Quantidade, média e histograma (RatingSummary) das avaliações de um produto."""
+    with _review_stats.lock:
+        _refresh_review_stats()
+        return _review_stats.get(int(product_id))
+
+def get_rating_summaries(product_ids):
+    """{ID do produto: RatingSummary} para vários produtos, com uma única verificação de versão."""
+    with _review_stats.lock:
+        _refresh_review_stats()
+        return {product_id: _review_stats.get(product_id) for product_id in product_ids}
+
+
+# --- BUSCA E FACETAS ---
+
+# Tabelas que compõem a versão do catálogo: as escritas de produtos e filtros seguram as duas.
+CATALOG_TABLES = ('products', 'filters')
+
+def get_catalog_version():
+    """Valor que muda sempre que produtos ou filtros são alterados, por qualquer processo."""
+    backend = get_backend()
+    return (backend.table_version('products'), backend.table_version('filters'))
+
+def _filter_names_by_id():
+    return {f.id: f.name for f in get_filters()}
+
+def _locked_write(tables, write, version=None):
+    """
+    Executa `write` com o lock de escrita das tabelas no backend (backend.write_lock) e lê
+    a versão dos dados (padrão: get_catalog_version) logo antes e logo depois, ainda com
+    o lock: a diferença entre as duas é só esta escrita, nunca a de outro processo.
+    Retorna (resultado de write, versão antes, versão depois).
+    """
+    version = version or get_catalog_version
+    with get_backend().write_lock(*tables):
+        before = version()
+        result = write()
+        after = version()
+    return result, before, after
+
+def _apply_to_index(index, version_before, version_after, update):
+    """
+    Aplica uma escrita deste processo a um índice derivado de forma incremental, com as
+    versões lidas por _locked_write. Só é seguro se o índice refletia exatamente os dados
+    de antes da escrita; caso contrário ele perdeu outra escrita e é invalidado, para ser
+    reconstruído na próxima consulta.
+    """
+    with index.lock:
+        if index.version is None or index.version == version_after:
+            return
+        if index.version != version_before:
+            index.version = None
+            return
+        update(index)
+        index.version = version_after
+
+def search_products(query, limit=None):
+    """
+    Busca produtos por nome, marca, descrição, especificações e nomes de filtros,
+    ignorando acentos e maiúsculas e aceitando prefixos (busca enquanto se digita).
+    Retorna os produtos do mais relevante para o menos relevante.
+    """
+    with _search_index.lock:
+        version = get_catalog_version()
+        if _search_index.version != version:
+            _search_index.rebuild(get_products(), _filter_names_by_id(), version)
+        product_ids = _search_index.search(query, limit)
+    return get_products_by_ids(product_ids)
+
+def _refresh_facet_index():
+    version = get_catalog_version()
+    if _facet_index.version != version:
+        _facet_index.rebuild(get_products(), get_filters(), version)
+
+def filter_products(filter_ids=(), min_price=None, max_price=None):
+    """
+    Filtra o catálogo por facetas: OU entre filtros do mesmo tipo, E entre tipos
+    diferentes, e uma faixa de preço opcional. Retorna (IDs dos produtos encontrados,
+    {ID do filtro: contagem}), com as contagens para a barra lateral.
+    """
+    with _facet_index.lock:
+        _refresh_facet_index()
+        return _facet_index.query(filter_ids, min_price, max_price)
+
+def _refresh_catalog_snapshot():
+    version = get_catalog_version()
+    if _catalog_snapshot.version != version:
+        _catalog_snapshot.rebuild(get_products(), version)
+
+def list_product_ids(product_ids=None, sort='id', descending=False, min_price=None, max_price=None):
+    """
+    IDs dos produtos (todos, ou só os de `product_ids`) na faixa de preço informada,
+    ordenados por 'id', 'price' ou 'name', calculados sobre a cópia colunar do catálogo.
+    Quem pagina busca depois só os produtos da página, com get_products_by_ids.
+    """
+    with _catalog_snapshot.lock:
+        _refresh_catalog_snapshot()
+        return _catalog_snapshot.ordered_ids(product_ids, sort, descending, min_price, max_price)
+
+def count_products(status=None):
+    """Quantidade de produtos do catálogo (opcionalmente só os com o status informado), sem copiá-los."""
+    with _catalog_snapshot.lock:
+        _refresh_catalog_snapshot()
+        return _catalog_snapshot.count(status)
+
+def get_price_range():
+    """Retorna (menor preço, maior preço) dos produtos do catálogo, lidos da cópia colunar."""
+    with _catalog_snapshot.lock:
+        _refresh_catalog_snapshot()
+        return _catalog_snapshot.price_range()
+
+
+# --- VISITAS ---
+
+def set_visit_recorder(recorder):
+    """Define a fila de visitas em uso, encerrando (com descarga final) a anterior."""
+    global _visit_recorder
+    previous, _visit_recorder = _visit_recorder, recorder
+    if previous is not None:
+        previous.stop()
+
+def set_visit_rollups(rollups):
+    """Define o armazenamento de agregados de visitas, montando-o a partir do log bruto se for novo."""
+    global _visit_rollups
+    if rollups is not None:
+        rollups.ensure_built(lambda: get_backend().iter_visits())
+    _visit_rollups = rollups
+
+def rebuild_visit_rollups():
+    """Recalcula todos os agregados a partir do log bruto de visitas."""
+    flush_visits()
+    if _visit_rollups is not None:
+        _visit_rollups.rebuild(get_backend().iter_visits())
+
+def _store_visits(visits):
+    """Grava um lote de visitas no log bruto e o incorpora aos agregados."""
+    get_backend().register_visits(visits)
+    if _visit_rollups is not None:
+        _visit_rollups.add(visits)
+    # A compactação roda no máximo uma vez por dia, junto da gravação de um lote
+    # (na thread da fila de visitas, quando ela está ativa).
+    if _last_compaction is None or datetime.utcnow() - _last_compaction >= timedelta(days=1):
+        compact_visits()
+
+def _months_before(moment, months):
+    """Primeiro dia do mês que fica `months` meses antes do mês de `moment`."""
+    total = moment.year * 12 + moment.month - 1 - months
+    return datetime(total // 12, total % 12 + 1, 1)
+
+def compact_visits(now=None):
+    """
+    Aplica a política de retenção das visitas (VISITS_RETENTION_MONTHS e
+    VISITS_HOURLY_RETENTION_DAYS): as partições do log bruto mais antigas que a
+    retenção são incorporadas aos agregados e apagadas, e os buckets por hora antigos
+    são descartados. O histórico continua disponível nos buckets de dia, semana, mês e
+    ano, de modo que o disco e o tempo das consultas não crescem com a idade da loja.
+    Sem agregados ativos, o log bruto é a única fonte das estatísticas e não é apagado.
+    """
+    global _last_compaction
+    now = now or datetime.utcnow()
+    _last_compaction = now
+    if _visit_rollups is None:
+        return
+    try:
+        if _visits_retention['months']:
+            cutoff = _months_before(now, _visits_retention['months'])
+            # `add` é idempotente: reaplicar visitas que já estão nos buckets não muda nada.
+            batch = []
+            for visit in get_backend().iter_visits(end_time=cutoff):
+                batch.append(visit)
+                if len(batch) >= 10000:
+                    _visit_rollups.add(batch)
+                    batch = []
+            _visit_rollups.add(batch)
+            _visit_rollups.mark_compacted(cutoff)
+            get_backend().purge_visits(cutoff)
+        if _visits_retention['hourly_days']:
+            _visit_rollups.prune('hour', now - timedelta(days=_visits_retention['hourly_days']))
+    except Exception as e:
+        print(f"Erro ao compactar o log de visitas: {e}")
+
+def flush_visits():
+    """Grava imediatamente as visitas que ainda estão na fila deste processo."""
+    if _visit_recorder is not None:
+        _visit_recorder.flush()
 
 def register_visit(session_id):
     """
     Registra o timestamp e o ID da sessão de uma nova visita.
     A lógica de visita única por sessão deve ser gerenciada pelo chamador.
+    Com a fila de visitas ativa, a chamada só enfileira: a gravação acontece em lote,
+    fora da requisição.
     """
-    _ensure_file_exists(VISITS_CSV)
+    if _visit_recorder is not None:
+        _visit_recorder.record(session_id)
+        return
     try:
-        with open(VISITS_CSV, 'a', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=VISITS_FIELDNAMES)
-            if file.tell() == 0:
-                writer.writeheader()
-            writer.writerow({'timestamp': datetime.utcnow().isoformat(), 'session_id': session_id})
-    except IOError as e:
+        _store_visits([(datetime.utcnow(), session_id)])
+    except Exception as e:
         print(f"Erro ao registrar visita: {e}")
 
-def get_visits_count(time_range_str):
-    """Calcula o número de visitas únicas em um determinado período de tempo."""
-    visits_data = _read_csv(VISITS_CSV)
-    if not visits_data: return 0
-    now = datetime.utcnow()
-    range_map = {'24h': 1, '7d': 7, '30d': 30, '12m': 365}
-    days = range_map.get(time_range_str, 365)
-    start_time = now - timedelta(days=days)
-    
-    unique_sessions = set()
-    for row in visits_data:
-        timestamp_str = row.get('timestamp')
-        session_id = row.get('session_id')
-        if not timestamp_str or not session_id: continue
-        try:
-            if datetime.fromisoformat(timestamp_str.strip()) >= start_time:
-                unique_sessions.add(session_id)
-        except (ValueError, KeyError): continue
-    
-    return len(unique_sessions)
-
-def get_visits_per_period(period='day'):
+def get_visits_count(time_range_str, approximate=None):
+    """
+    Calcula o número de visitas únicas em um determinado período de tempo.
+    Com os agregados ativos, a resposta vem dos buckets, sem ler o log bruto.
+    Com approximate=True, a contagem une sketches HyperLogLog em vez de
+    conjuntos de sessões (None usa o padrão de VISITS_APPROXIMATE). Com
+    VISITS_EXACT_ROLLUPS = False só existem os sketches e a contagem é sempre aproximada.
+    """
+    flush_visits()
+    if approximate is None:
+        approximate = _visits_approximate
+    if _visit_rollups is not None:
+        return _visit_rollups.get_visits_count(time_range_str, approximate=approximate)
+    return get_backend().get_visits_count(time_range_str)
+
+def get_visits_per_period(period='day', approximate=None):
     """Agrupa as visitas únicas por período (dia, semana, mês, ano)."""
-    visits_data = _read_csv(VISITS_CSV)
-    now = datetime.utcnow()
-    
-    if period == 'day':
-        start_time = now - timedelta(days=6)
-        date_format = '%d/%m'
-        labels = [(start_time + timedelta(days=i)).strftime(date_format) for i in range(7)]
-    elif period == 'week':
-        start_time = now - timedelta(weeks=6)
-        date_format = 'W%U'
-        labels = [(start_time + timedelta(weeks=i)).strftime(date_format) for i in range(7)]
-    elif period == 'month':
-        start_time = now - timedelta(days=365)
-        date_format = '%b/%y'
-        labels = []
-        for i in range(12):
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            labels.append(datetime(year, month, 1).strftime(date_format))
-        labels.reverse()
-    else: 
-        start_time = now - timedelta(days=5*365)
-        date_format = '%Y'
-        labels = [str(year) for year in range(now.year - 4, now.year + 1)]
-
-    counts = {label: set() for label in labels}
-    
-    for row in visits_data:
-        timestamp_str = row.get('timestamp')
-        session_id = row.get('session_id')
-        if not timestamp_str or not session_id: continue
-        try:
-            visit_time = datetime.fromisoformat(timestamp_str.strip())
-            if visit_time >= start_time:
-                key = visit_time.strftime(date_format)
-                if key in counts:
-                    counts[key].add(session_id)
-        except (ValueError, KeyError): continue
-    
-    return [{"date": label, "count": len(counts[label])} for label in labels]
+    flush_visits()
+    if approximate is None:
+        approximate = _visits_approximate
+    if _visit_rollups is not None:
+        return _visit_rollups.get_visits_per_period(period, approximate=approximate)
+    return get_backend().get_visits_per_period(period)
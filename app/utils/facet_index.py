@@ -0,0 +1,154 @@
+import bisect
+import threading
+
+
+def _ids_from_bits(bits):
+    """IDs (em ordem crescente) dos bits ligados de um bitmap."""
+    ids = []
+    while bits:
+        lowest = bits & -bits
+        ids.append(lowest.bit_length() - 1)
+        bits ^= lowest
+    return ids
+
+
+class FacetIndex:
+    """
+    Índice de facetas do catálogo: para cada filtro, um bitmap (int do Python) cujo
+    bit N está ligado se o produto de ID N tem esse filtro.
+
+    Combinar facetas vira operações de bits: OU entre filtros do mesmo tipo
+    (ex: "Preto" ou "Branco") e E entre tipos diferentes (cor E conectividade).
+    Preços ficam numa lista ordenada, de modo que uma faixa de preço é resolvida
+    com busca binária. Filtros do tipo 'brand' também casam com o campo
+    Product.brand, como a página de produtos sempre fez.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.filters = {}
+        self._filter_bits = {}
+        self._product_filters = {}
+        self._brands = {}
+        self._prices = {}
+        self._price_order = []
+        self._all_bits = 0
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self.filters = {}
+            self._filter_bits = {}
+            self._product_filters = {}
+            self._brands = {}
+            self._prices = {}
+            self._price_order = []
+            self._all_bits = 0
+            self.version = None
+
+    def rebuild(self, products, filters, version=None):
+        with self.lock:
+            self.clear()
+            for filter_obj in filters:
+                self.set_filter(filter_obj)
+            for product in products:
+                self.index_product(product)
+            self.version = version
+
+    # --- ATUALIZAÇÃO INCREMENTAL ---
+
+    def _brand_filter_ids(self, brand):
+        return {fid for fid, f in self.filters.items() if f.type == 'brand' and f.name == brand}
+
+    def set_filter(self, filter_obj):
+        """Adiciona ou atualiza um filtro, recalculando só o seu bitmap."""
+        with self.lock:
+            self.filters[filter_obj.id] = filter_obj
+            bits = 0
+            for product_id, filter_ids in self._product_filters.items():
+                if filter_obj.id in filter_ids:
+                    bits |= 1 << product_id
+            if filter_obj.type == 'brand':
+                for product_id, brand in self._brands.items():
+                    if brand == filter_obj.name:
+                        bits |= 1 << product_id
+            self._filter_bits[filter_obj.id] = bits
+
+    def remove_filter(self, filter_id):
+        with self.lock:
+            self.filters.pop(filter_id, None)
+            self._filter_bits.pop(filter_id, None)
+
+    def index_product(self, product):
+        with self.lock:
+            self.remove_product(product.id)
+            bit = 1 << product.id
+            filter_ids = set(product.filters) | self._brand_filter_ids(product.brand)
+            for filter_id in filter_ids:
+                if filter_id in self._filter_bits:
+                    self._filter_bits[filter_id] |= bit
+            self._product_filters[product.id] = set(product.filters)
+            self._brands[product.id] = product.brand
+            self._prices[product.id] = product.price
+            bisect.insort(self._price_order, (product.price, product.id))
+            self._all_bits |= bit
+
+    def remove_product(self, product_id):
+        with self.lock:
+            if product_id not in self._prices:
+                return
+            mask = ~(1 << product_id)
+            for filter_id in self._product_filters.pop(product_id) | self._brand_filter_ids(self._brands.pop(product_id)):
+                if filter_id in self._filter_bits:
+                    self._filter_bits[filter_id] &= mask
+            price = self._prices.pop(product_id)
+            del self._price_order[bisect.bisect_left(self._price_order, (price, product_id))]
+            self._all_bits &= mask
+
+    # --- CONSULTA ---
+
+    def _price_bits(self, min_price, max_price):
+        if min_price is None and max_price is None:
+            return self._all_bits
+        start = 0 if min_price is None else bisect.bisect_left(self._price_order, (min_price, -1))
+        end = len(self._price_order) if max_price is None else bisect.bisect_right(self._price_order, (max_price, float('inf')))
+        bits = 0
+        for _, product_id in self._price_order[start:end]:
+            bits |= 1 << product_id
+        return bits
+
+    def query(self, filter_ids=(), min_price=None, max_price=None):
+        """
+        Filtra o catálogo. Retorna (IDs dos produtos em ordem crescente, contagens),
+        onde contagens mapeia cada filtro -> número de produtos que o resultado teria
+        se esse filtro também fosse marcado. A contagem de um filtro ignora a seleção
+        do seu próprio tipo, como é comum em barras laterais de facetas. Um filtro que
+        não existe não casa com nenhum produto: o resultado e as contagens ficam vazios.
+        """
+        with self.lock:
+            by_type = {}
+            unknown = False
+            for filter_id in filter_ids:
+                filter_obj = self.filters.get(filter_id)
+                if filter_obj is None:
+                    unknown = True
+                else:
+                    by_type[filter_obj.type] = by_type.get(filter_obj.type, 0) | self._filter_bits[filter_id]
+            base = 0 if unknown else self._price_bits(min_price, max_price)
+            result = base
+            for bits in by_type.values():
+                result &= bits
+            # Para as contagens, cada tipo usa as restrições de todos os outros tipos.
+            others_by_type = {}
+            for filter_type in {f.type for f in self.filters.values()}:
+                others = base
+                for other_type, bits in by_type.items():
+                    if other_type != filter_type:
+                        others &= bits
+                others_by_type[filter_type] = others
+            counts = {
+                # bin().count em vez de int.bit_count, que só existe a partir do Python 3.10.
+                filter_id: bin(self._filter_bits[filter_id] & others_by_type[f.type]).count('1')
+                for filter_id, f in self.filters.items()
+            }
+            return _ids_from_bits(result), counts
@@ -0,0 +1,130 @@
+import math
+import base64
+import hashlib
+
+MIN_PRECISION = 4
+MAX_PRECISION = 16
+
+
+def _hash64(value):
+    """Hash estável de 64 bits (o hash() do Python muda a cada processo)."""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _alpha(m):
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    """
+    Contador aproximado de elementos distintos (HyperLogLog).
+
+    Usa 2**precision registradores de um byte, independente de quantas sessões
+    são adicionadas; o erro padrão é de aproximadamente 1.04 / sqrt(2**precision).
+    Sketches podem ser unidos (merge) sem perda, o que permite somar dias em
+    semanas, meses e anos, e serializados de forma compacta para o disco.
+    """
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision=12, registers=None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"A precisão deve estar entre {MIN_PRECISION} e {MAX_PRECISION}.")
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    @staticmethod
+    def precision_for_error(error):
+        """Menor precisão cujo erro padrão não ultrapassa `error` (ex: 0.01 para 1%)."""
+        precision = math.ceil(math.log2((1.04 / error) ** 2))
+        return max(MIN_PRECISION, min(MAX_PRECISION, precision))
+
+    @classmethod
+    def for_error(cls, error):
+        return cls(cls.precision_for_error(error))
+
+    def add(self, value):
+        hashed = _hash64(value)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rest = hashed & ((1 << bits) - 1)
+        rank = bits - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def fold(self, precision):
+        """Retorna uma cópia reduzida para uma precisão menor, para unir sketches de precisões diferentes."""
+        if precision == self.precision:
+            return HyperLogLog(precision, bytearray(self.registers))
+        if precision > self.precision:
+            raise ValueError("Não é possível aumentar a precisão de um sketch.")
+        shift = self.precision - precision
+        folded = bytearray(1 << precision)
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            low_bits = index & ((1 << shift) - 1)
+            new_rank = shift - low_bits.bit_length() + 1 if low_bits else rank + shift
+            new_index = index >> shift
+            if new_rank > folded[new_index]:
+                folded[new_index] = new_rank
+        return HyperLogLog(precision, folded)
+
+    def merge(self, other):
+        """Une `other` a este sketch (in place). Retorna o próprio sketch."""
+        if other.precision != self.precision:
+            precision = min(self.precision, other.precision)
+            if self.precision != precision:
+                self.registers = self.fold(precision).registers
+                self.precision = precision
+            other = other.fold(precision)
+        if not any(self.registers):
+            self.registers = bytearray(other.registers)
+        else:
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        estimate = _alpha(m) * m * m / sum(2.0 ** -rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Correção para cardinalidades pequenas (linear counting).
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+    def to_dict(self):
+        """
+        Serializa para JSON. Sketches com poucos registradores preenchidos (o caso
+        comum em buckets de hora e dia) são gravados no formato esparso.
+        """
+        filled = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if len(filled) * 4 < len(self.registers):
+            return {'p': self.precision, 'sparse': filled}
+        return {'p': self.precision, 'dense': base64.b64encode(bytes(self.registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(int(data['p']))
+        if 'dense' in data:
+            registers = bytearray(base64.b64decode(data['dense']))
+            if len(registers) != len(sketch.registers):
+                raise ValueError("Sketch corrompido: número de registradores inválido.")
+            sketch.registers = registers
+        else:
+            for index, rank in data.get('sparse', []):
+                sketch.registers[index] = rank
+        return sketch
@@ -0,0 +1,214 @@
+import os
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import click
+from app.utils import data_manager
+from app.utils.safe_io import atomic_write
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # O Pillow é opcional: sem ele, as imagens são exibidas como foram enviadas.
+    Image = ImageOps = None
+
+# Larguras (px) das versões geradas para cada imagem enviada; o navegador escolhe pelo srcset.
+DEFAULT_WIDTHS = (320, 640, 1280)
+PROCESSABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+WEBP_EXTENSION = '.webp'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def fallback_extension(path):
+    """Formato das variantes para navegadores sem WebP: PNG preserva a transparência, o resto vira JPEG."""
+    return '.png' if path.lower().endswith('.png') else '.jpg'
+
+
+def variant_path(path, width, extension):
+    """Caminho (ou URL) de uma variante: /static/uploads/3/foto.jpeg -> /static/uploads/3/foto-640w.webp."""
+    stem, _ = os.path.splitext(path)
+    return f'{stem}-{width}w{extension}'
+
+
+def image_sources(product, url):
+    """
+    Atributos para exibir uma imagem do produto: `src`, `srcset` (JPEG/PNG) e `webp_srcset`.
+    Enquanto as variantes não existirem, `src` é a própria imagem enviada e os srcset ficam vazios.
+    """
+    widths = product.image_variants.get(url) if url else None
+    if not widths:
+        return {'src': url, 'srcset': '', 'webp_srcset': ''}
+    fallback = fallback_extension(url)
+    return {
+        'src': variant_path(url, widths[-1], fallback),
+        'srcset': ', '.join(f'{variant_path(url, width, fallback)} {width}w' for width in widths),
+        'webp_srcset': ', '.join(f'{variant_path(url, width, WEBP_EXTENSION)} {width}w' for width in widths),
+    }
+
+
+def remove_image(path, widths=()):
+    """Apaga uma imagem enviada e as suas variantes."""
+    extensions = (fallback_extension(path), WEBP_EXTENSION)
+    for target in [path] + [variant_path(path, width, ext) for width in widths for ext in extensions]:
+        try:
+            os.remove(target)
+        except FileNotFoundError:
+            pass
+
+
+def _save(image, path, image_format, quality):
+    options = {'quality': quality} if image_format in ('JPEG', 'WEBP') else {'optimize': True}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    # Só o perfil de cor é mantido; EXIF (GPS, câmera, ...) e demais metadados não são gravados.
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    with atomic_write(path, mode='wb', newline=None, encoding=None) as file:
+        image.save(file, format=image_format, **options)
+
+
+def _flatten(image):
+    """Converte para RGB (JPEG não tem transparência), pintando áreas transparentes de branco."""
+    if image.mode in ('RGB', 'L'):
+        return image
+    rgba = image.convert('RGBA')
+    background = Image.new('RGB', rgba.size, (255, 255, 255))
+    background.paste(rgba, mask=rgba.getchannel('A'))
+    background.info = image.info
+    return background
+
+
+def _open_oriented(path):
+    """Abre a imagem com a orientação do EXIF já aplicada. Retorna (imagem, formato original)."""
+    with Image.open(path) as source:
+        source_format = source.format
+        # Aplica a orientação do EXIF antes de descartá-lo, senão fotos de celular ficam deitadas.
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        # Paleta (P), CMYK, etc.: redimensionar com LANCZOS e gravar em WebP exige RGB(A).
+        has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    return image, source_format
+
+
+def strip_metadata(path, filename=None, quality=90):
+    """
+    Regrava no lugar uma imagem enviada sem EXIF (GPS, câmera, ...) e demais metadados,
+    mantendo só o perfil de cor. `filename` é o nome original (o arquivo pode ser um
+    temporário sem extensão). Retorna True se o arquivo foi regravado; arquivos que não
+    são imagens processáveis, ou sem o Pillow instalado, ficam como estão.
+    """
+    if Image is None or not (filename or path).lower().endswith(PROCESSABLE_EXTENSIONS):
+        return False
+    try:
+        image, source_format = _open_oriented(path)
+        _save(image, path, source_format, quality)
+    except (OSError, ValueError) as e:
+        print(f"Erro ao remover os metadados da imagem {filename or path}: {e}")
+        return False
+    return True
+
+
+def process_image(path, widths=DEFAULT_WIDTHS, quality=80, rewrite_original=True):
+    """
+    Gera as variantes de uma imagem já salva em `path` (uma por largura, no formato
+    original e em WebP) e, com `rewrite_original`, regrava o original sem metadados.
+    Imagens menores que a maior largura ganham uma variante no tamanho original.
+    Retorna as larguras geradas.
+    """
+    image, source_format = _open_oriented(path)
+    if rewrite_original:
+        _save(image, path, source_format, quality=max(quality, 90))
+
+    fallback = fallback_extension(path)
+    fallback_format = 'PNG' if fallback == '.png' else 'JPEG'
+    generated = sorted({min(width, image.width) for width in widths})
+    for width in generated:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        resized.info = image.info
+        _save(resized if fallback_format == 'PNG' else _flatten(resized),
+              variant_path(path, width, fallback), fallback_format, quality)
+        _save(resized, variant_path(path, width, WEBP_EXTENSION), 'WEBP', quality)
+    return generated
+
+
+def _existing_widths(path):
+    """Larguras das variantes já geradas para um arquivo (ex: por outro produto com o mesmo blob)."""
+    stem, _ = os.path.splitext(path)
+    suffix = 'w' + fallback_extension(path)
+    widths = []
+    for variant in glob.glob(glob.escape(stem) + '-*' + suffix):
+        width = variant[len(stem) + 1:-len(suffix)]
+        if width.isdigit():
+            widths.append(int(width))
+    return sorted(widths)
+
+
+def _process_product_images(upload_folder, product_id, urls, widths, quality):
+    variants = {}
+    for url in urls:
+        blob = data_manager.blob_path(url)
+        path = blob or os.path.join(upload_folder, str(product_id), os.path.basename(url))
+        try:
+            # Blobs são imutáveis (o nome é o hash do conteúdo) e já foram gravados sem metadados
+            # (strip_metadata, em data_manager.store_upload): o original não é regravado e as
+            # variantes de um blob já processado são reaproveitadas.
+            existing = _existing_widths(path) if blob else []
+            variants[url] = existing or process_image(path, widths, quality, rewrite_original=blob is None)
+        except Exception as e:
+            print(f"Erro ao processar a imagem {path}: {e}")
+    if variants:
+        data_manager.set_image_variants(product_id, variants)
+    return variants
+
+
+def _get_executor(workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-pipeline')
+        return _executor
+
+
+def schedule_product_images(app, product):
+    """
+    Agenda a geração das variantes das imagens do produto que ainda não as têm.
+
+    O processamento roda no pool de IMAGE_WORKERS threads, sem bloquear a requisição do
+    admin; ao terminar, as larguras geradas são gravadas em Product.image_variants.
+    Com IMAGE_WORKERS = 0, roda na hora. Sem o Pillow instalado, não faz nada.
+    """
+    if Image is None:
+        return None
+    pending = [url for url in product.images
+               if url not in product.image_variants and url.lower().endswith(PROCESSABLE_EXTENSIONS)]
+    if not pending:
+        return None
+    args = (
+        app.config['UPLOAD_FOLDER'], product.id, pending,
+        tuple(app.config.get('IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS)), app.config.get('IMAGE_QUALITY', 80),
+    )
+    workers = app.config.get('IMAGE_WORKERS', 2)
+    if workers <= 0:
+        _process_product_images(*args)
+        return None
+    return _get_executor(workers).submit(_process_product_images, *args)
+
+
+def init_image_pipeline(app):
+    """Registra o helper image_sources no Jinja e o comando `flask process-images`."""
+    app.jinja_env.globals.update(image_sources=image_sources)
+
+    @app.cli.command('process-images')
+    def process_images_command():
+        """Gera as variantes das imagens de produtos cadastrados antes do pipeline existir."""
+        if Image is None:
+            click.echo("O Pillow não está instalado (pip install Pillow).")
+            return
+        app.config['IMAGE_WORKERS'] = 0
+        for product in data_manager.get_products():
+            schedule_product_images(app, product)
+        click.echo("Imagens processadas.")
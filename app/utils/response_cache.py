@@ -0,0 +1,92 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request
+from app.utils import data_manager
+from app.utils.compression import compress_response
+
+
+class CachedResponse:
+    __slots__ = ('version', 'body', 'mimetype', 'etag', 'encoded')
+
+    def __init__(self, version, body, mimetype, etag):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        # Corpo já comprimido por codificação ('gzip', 'br'), preenchido sob demanda.
+        self.encoded = {}
+
+
+class ResponseCache:
+    """
+    Cache em memória de respostas já serializadas (bytes), por URL.
+
+    Cada entrada guarda a versão do catálogo com que foi gerada; se a versão atual
+    for outra (alteração feita por este ou por outro processo), a entrada é ignorada
+    e refeita. O ETag é derivado da versão e da URL, então é o mesmo em todos os
+    workers. Guarda no máximo `max_entries` URLs, descartando as menos usadas.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, body, mimetype):
+        digest = hashlib.sha1(f'{version!r}|{key}'.encode('utf-8')).hexdigest()
+        entry = CachedResponse(version, body, mimetype, digest)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+catalog_cache = ResponseCache()
+
+
+def cached_catalog_response(view):
+    """
+    Decorador para rotas públicas que só dependem do catálogo (produtos e filtros)
+    e das avaliações (médias exibidas na listagem).
+
+    A resposta (apenas status 200) é guardada em catalog_cache e reenviada enquanto
+    o catálogo e as avaliações não mudarem, com ETag forte e Cache-Control; um If-None-Match igual ao
+    ETag recebe 304 sem corpo. CATALOG_CACHE_MAX_AGE define por quantos segundos
+    navegadores e proxies podem reutilizar a resposta sem revalidar.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.full_path
+        version = (data_manager.get_catalog_version(), data_manager.get_reviews_version())
+        entry = catalog_cache.get(key, version)
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = catalog_cache.put(key, version, response.get_data(), response.mimetype)
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config.get('CATALOG_CACHE_MAX_AGE', 0)
+        response.cache_control.must_revalidate = True
+        response = response.make_conditional(request)
+        if current_app.config.get('COMPRESS_RESPONSES', True):
+            response = compress_response(response, current_app, entry.encoded)
+        return response
+    return wrapper
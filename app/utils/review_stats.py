@@ -0,0 +1,90 @@
+import threading
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+class RatingSummary:
+    """Agregado das avaliações de um produto: quantidade, soma das notas e histograma de 1 a 5 estrelas."""
+
+    __slots__ = ('count', 'total', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0] * len(RATING_VALUES)
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, rating, amount=1):
+        self.count += amount
+        self.total += rating * amount
+        self.histogram[rating - 1] += amount
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'average': round(self.average, 2),
+            'histogram': {str(rating): self.histogram[rating - 1] for rating in RATING_VALUES},
+        }
+
+
+class ReviewStats:
+    """
+    Agregados das avaliações por produto, mantidos na memória.
+
+    Inserções e exclusões de avaliações atualizam só o agregado do produto em O(1),
+    então a média e o histograma nunca são recalculados sobre todas as avaliações
+    a cada requisição. Notas fora de 1 a 5 (linhas corrompidas) são ignoradas.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._summaries = {}
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self._summaries = {}
+            self.version = None
+
+    def rebuild(self, rating_counts, version=None):
+        """Recria os agregados a partir de (ID do produto, nota, quantidade), ex: backend.get_rating_counts()."""
+        with self.lock:
+            self.clear()
+            for product_id, rating, amount in rating_counts:
+                self._update(product_id, rating, amount)
+            self.version = version
+
+    def _update(self, product_id, rating, amount):
+        if rating not in RATING_VALUES:
+            return
+        summary = self._summaries.get(product_id)
+        if summary is None:
+            summary = self._summaries[product_id] = RatingSummary()
+        summary.add(rating, amount)
+        if summary.count <= 0:
+            del self._summaries[product_id]
+
+    # --- ATUALIZAÇÃO INCREMENTAL ---
+
+    def add(self, review):
+        with self.lock:
+            self._update(review.product_id, review.rating, 1)
+
+    def remove(self, review):
+        with self.lock:
+            if review.product_id in self._summaries:
+                self._update(review.product_id, review.rating, -1)
+
+    # --- CONSULTA ---
+
+    def get(self, product_id):
+        """Cópia do agregado do produto (vazio se ele não tiver avaliações)."""
+        copy = RatingSummary()
+        with self.lock:
+            summary = self._summaries.get(product_id)
+            if summary is not None:
+                copy.count, copy.total, copy.histogram = summary.count, summary.total, list(summary.histogram)
+        return copy
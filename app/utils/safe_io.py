@@ -0,0 +1,112 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: não há flock, apenas o lock entre threads é aplicado.
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_held = threading.local()
+
+
+def _thread_lock_for(path):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(path)
+        if lock is None:
+            lock = _thread_locks[path] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Lock exclusivo associado a `path`, válido entre threads e entre processos.
+
+    Entre processos usa um lock consultivo (fcntl.flock) sobre o arquivo auxiliar
+    `path + '.lock'`, de modo que vários workers do gunicorn serializem seus ciclos
+    de leitura-modificação-escrita. O lock é reentrante dentro da mesma thread.
+    """
+    path = os.path.abspath(path)
+    held = _held.__dict__.setdefault('paths', {})
+    if held.get(path):
+        held[path] += 1
+        try:
+            yield
+        finally:
+            held[path] -= 1
+        return
+
+    with _thread_lock_for(path):
+        lock_file = None
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            lock_file = open(path + '.lock', 'a')
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        held[path] = 1
+        try:
+            yield
+        finally:
+            held.pop(path, None)
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+
+
+def _fsync_directory(directory):
+    """Garante que a troca de nomes feita por os.replace sobreviva a uma queda de energia."""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode='w', newline='', encoding='utf-8'):
+    """
+    Abre um arquivo temporário no mesmo diretório de `path` e, ao final do bloco,
+    faz fsync e o move sobre o destino com os.replace.
+
+    Leitores concorrentes veem sempre o arquivo antigo ou o novo completo, nunca
+    um arquivo truncado. Se o bloco lançar uma exceção, o destino não é alterado.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp cria o arquivo com permissão 0600; preserva a permissão do original.
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+        if 'b' in mode:
+            file = os.fdopen(fd, mode)
+        else:
+            file = os.fdopen(fd, mode, newline=newline, encoding=encoding)
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def append_durable(path, data, encoding='utf-8'):
+    """Acrescenta `data` (str) ao final do arquivo e força a gravação em disco."""
+    with open(path, 'a', newline='', encoding=encoding) as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
@@ -0,0 +1,130 @@
+import re
+import bisect
+import threading
+import unicodedata
+
+# Peso de cada campo no ranking: um termo no nome vale mais que o mesmo termo na descrição.
+FIELD_WEIGHTS = {
+    'name': 5.0,
+    'brand': 3.0,
+    'filters': 2.0,
+    'specs': 1.0,
+    'description': 1.0,
+}
+# Um termo encontrado só por prefixo (busca enquanto o usuário digita) vale menos que o termo exato.
+PREFIX_FACTOR = 0.5
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Remove acentos e diferenças de maiúsculas/minúsculas ('Fone Sem Fio' == 'fone sem fio', 'áudio' == 'audio')."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(normalize(text))
+
+
+class ProductSearchIndex:
+    """
+    Índice invertido em memória dos produtos: termo normalizado -> {product_id: peso}.
+
+    Os termos ficam também numa lista ordenada, de modo que uma busca por prefixo
+    ('fon' -> 'fone', 'fones') é uma busca binária seguida de uma varredura apenas
+    dos termos que começam com o prefixo. Produtos são indexados e removidos de
+    forma incremental; `version` guarda a versão dos dados que o índice reflete,
+    para que o data_manager saiba quando precisa reconstruí-lo.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._postings = {}
+        self._terms = []
+        self._documents = {}
+        self.lock = threading.RLock()
+
+    def clear(self):
+        with self.lock:
+            self._postings = {}
+            self._terms = []
+            self._documents = {}
+            self.version = None
+
+    def rebuild(self, products, filter_names_by_id, version=None):
+        """Reindexa o catálogo inteiro. `filter_names_by_id` mapeia ID do filtro -> nome."""
+        with self.lock:
+            self.clear()
+            for product in products:
+                self.index_product(product, filter_names_by_id)
+            self.version = version
+
+    def index_product(self, product, filter_names_by_id):
+        """Indexa (ou reindexa) um produto."""
+        fields = {
+            'name': product.name,
+            'brand': product.brand,
+            'description': product.description,
+            'specs': product.specs,
+            'filters': ' '.join(filter_names_by_id.get(fid, '') for fid in product.filters),
+        }
+        weights = {}
+        for field, text in fields.items():
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0.0) + FIELD_WEIGHTS[field]
+        with self.lock:
+            self.remove_product(product.id)
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                postings[product.id] = weight
+            self._documents[product.id] = tuple(weights)
+
+    def remove_product(self, product_id):
+        with self.lock:
+            for term in self._documents.pop(product_id, ()):
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[term]
+                    del self._terms[bisect.bisect_left(self._terms, term)]
+
+    def _matches(self, token):
+        """Pontuação de cada produto para um termo da busca (exato ou por prefixo)."""
+        scores = {}
+        position = bisect.bisect_left(self._terms, token)
+        while position < len(self._terms) and self._terms[position].startswith(token):
+            term = self._terms[position]
+            position += 1
+            factor = 1.0 if term == token else PREFIX_FACTOR
+            for product_id, weight in self._postings[term].items():
+                score = weight * factor
+                if score > scores.get(product_id, 0.0):
+                    scores[product_id] = score
+        return scores
+
+    def search(self, query, limit=None):
+        """
+        Retorna os IDs dos produtos que contêm todos os termos da busca (cada um
+        como palavra inteira ou prefixo), do mais relevante para o menos relevante.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self.lock:
+            totals = None
+            for token in dict.fromkeys(tokens):
+                scores = self._matches(token)
+                if totals is None:
+                    totals = scores
+                else:
+                    totals = {pid: totals[pid] + score for pid, score in scores.items() if pid in totals}
+                if not totals:
+                    return []
+        ranked = sorted(totals, key=lambda pid: (-totals[pid], pid))
+        return ranked[:limit] if limit else ranked
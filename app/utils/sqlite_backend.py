@@ -0,0 +1,390 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from app.models.user import User
+from app.models.product import Product
+from app.models.review import Review
+from app.models.filter import Filter
+from app.utils.storage_backend import StorageBackend, TABLES, VISITS_RANGE_DAYS, decode_rows, parse_visit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    role TEXT NOT NULL,
+    profile_picture TEXT,
+    date_joined TEXT,
+    address TEXT,
+    city TEXT,
+    state TEXT,
+    zip_code TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_email ON users (email);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (username);
+
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    brand TEXT,
+    price REAL NOT NULL DEFAULT 0,
+    status TEXT,
+    images TEXT NOT NULL DEFAULT '[]',
+    description TEXT,
+    specs TEXT,
+    seller_id INTEGER,
+    filters TEXT NOT NULL DEFAULT '[]',
+    image_variants TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_products_status ON products (status);
+CREATE INDEX IF NOT EXISTS idx_products_price ON products (price);
+
+CREATE TABLE IF NOT EXISTS filters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    rating INTEGER NOT NULL,
+    comment TEXT,
+    media_url TEXT,
+    date_posted TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reviews_product_date ON reviews (product_id, date_posted, id);
+CREATE INDEX IF NOT EXISTS idx_reviews_product_rating_date ON reviews (product_id, rating, date_posted, id);
+
+CREATE TABLE IF NOT EXISTS visits (
+    timestamp TEXT NOT NULL,
+    session_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_visits_timestamp ON visits (timestamp, session_id);
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+# Cada escrita em uma tabela incrementa a sua versão, para que os caches em memória
+# de todos os workers (ex: o índice de busca) percebam alterações feitas por outro processo.
+for _table in TABLES:
+    for _event in ('INSERT', 'UPDATE', 'DELETE'):
+        SCHEMA += f"""
+CREATE TRIGGER IF NOT EXISTS trg_{_table}_{_event.lower()}_version AFTER {_event} ON {_table}
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('{_table}', 1)
+    ON CONFLICT(name) DO UPDATE SET version = version + 1;
+END;
+"""
+
+# Colunas criadas depois da primeira versão do esquema: bancos antigos as recebem via ALTER TABLE.
+ADDED_COLUMNS = {
+    'products': {'image_variants': "TEXT NOT NULL DEFAULT '{}'"},
+}
+
+_MODELS = {'users': User, 'products': Product, 'filters': Filter, 'reviews': Review}
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Backend baseado no sqlite3 da biblioteca padrão, em modo WAL.
+
+    Com WAL, leitores nunca bloqueiam o escritor e vários workers podem gravar
+    no mesmo arquivo; o busy_timeout faz um escritor esperar pelo outro em vez
+    de falhar. Cada thread (e cada processo, após um fork) usa sua própria conexão.
+    As colunas guardam os mesmos valores de to_dict(), de modo que a conversão
+    dos modelos é idêntica à do backend CSV.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, database_path, import_from=None):
+        """
+        Args:
+            database_path (str): caminho do arquivo .sqlite3.
+            import_from (StorageBackend): se informado e o banco estiver sendo criado
+                agora, seus dados são copiados para o novo banco (migração única).
+        """
+        self.database_path = database_path
+        self._local = threading.local()
+        is_new = not os.path.exists(database_path)
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self._add_missing_columns()
+        if is_new and import_from is not None:
+            self.import_from(import_from)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.database_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _add_missing_columns(self):
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {row['name'] for row in self._query(f'PRAGMA table_info({table})')}
+            for column, definition in columns.items():
+                if column not in existing:
+                    self._query(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+    @contextmanager
+    def _transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT (ROLLBACK se o bloco falhar): o lock de escrita do banco é
+        obtido já no início. Dentro de uma transação já aberta, o bloco só participa dela.
+        """
+        conn = self._connection()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _query(self, sql, params=()):
+        return self._connection().execute(sql, params)
+
+    def _fetch_models(self, table, sql, params=()):
+        model = _MODELS[table]
+        return decode_rows(model, [dict(row) for row in self._query(sql, params)])
+
+    def _fetch_model(self, table, sql, params=()):
+        row = self._query(sql, params).fetchone()
+        return _MODELS[table].from_dict(dict(row)) if row is not None else None
+
+    def _upsert(self, table, data):
+        """INSERT ... ON CONFLICT(id) DO UPDATE: grava a linha com o ID informado."""
+        columns = list(data)
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'{c} = excluded.{c}' for c in columns if c != 'id')
+        self._query(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders}) '
+            f'ON CONFLICT(id) DO UPDATE SET {updates}',
+            [data[c] for c in columns]
+        )
+
+    def _insert(self, table, data):
+        """Insere sem ID e retorna o ID gerado pelo AUTOINCREMENT (nunca reaproveitado)."""
+        columns = [c for c in data if c != 'id']
+        placeholders = ', '.join('?' for _ in columns)
+        cursor = self._query(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})',
+            [data[c] for c in columns]
+        )
+        return cursor.lastrowid
+
+    def _delete(self, table, item_id):
+        return self._query(f'DELETE FROM {table} WHERE id = ?', (_to_id(item_id),)).rowcount > 0
+
+    def _exists(self, table, item_id):
+        return self._query(f'SELECT 1 FROM {table} WHERE id = ?', (item_id,)).fetchone() is not None
+
+    def import_from(self, source):
+        """Copia todas as tabelas e o log de visitas de outro backend, preservando os IDs."""
+        with self._transaction() as conn:
+            for user in source.get_users():
+                try:
+                    self._upsert('users', user.to_dict())
+                except sqlite3.IntegrityError as e:
+                    print(f"Usuário {user.id} ({user.email}) não importado: {e}")
+            for product in source.get_products():
+                self._upsert('products', product.to_dict())
+            for filter_obj in source.get_filters():
+                self._upsert('filters', filter_obj.to_dict())
+            for review in source.get_reviews():
+                self._upsert('reviews', review.to_dict())
+            conn.executemany(
+                'INSERT INTO visits (timestamp, session_id) VALUES (?, ?)',
+                ((visit_time.isoformat(), session_id) for visit_time, session_id in source.iter_visits())
+            )
+
+    @contextmanager
+    def write_lock(self, *tables):
+        # O SQLite tem um único lock de escrita para o banco inteiro.
+        with self._transaction():
+            yield
+
+    def table_version(self, table):
+        row = self._query('SELECT version FROM table_versions WHERE name = ?', (table,)).fetchone()
+        return row['version'] if row else 0
+
+    def next_id(self, table):
+        row = self._query('SELECT seq FROM sqlite_sequence WHERE name = ?', (table,)).fetchone()
+        return (row['seq'] if row else 0) + 1
+
+    # --- USUÁRIOS ---
+
+    def get_users(self):
+        return self._fetch_models('users', 'SELECT * FROM users ORDER BY id')
+
+    def get_user_by_id(self, user_id):
+        return self._fetch_model('users', 'SELECT * FROM users WHERE id = ?', (_to_id(user_id),))
+
+    def get_user_by_email(self, email):
+        return self._fetch_model('users', 'SELECT * FROM users WHERE email = ?', (email,))
+
+    def get_user_by_username(self, username):
+        return self._fetch_model('users', 'SELECT * FROM users WHERE username = ? LIMIT 1', (username,))
+
+    def email_exists(self, email):
+        return self._query('SELECT 1 FROM users WHERE email = ?', (email,)).fetchone() is not None
+
+    def save_user(self, user):
+        user.id = _to_id(user.id)
+        if user.id is not None and self._exists('users', user.id):
+            self._upsert('users', user.to_dict())
+        else:
+            user.id = self._insert('users', user.to_dict())
+
+    # --- PRODUTOS ---
+
+    def get_products(self):
+        return self._fetch_models('products', 'SELECT * FROM products ORDER BY id')
+
+    def get_product_by_id(self, product_id):
+        return self._fetch_model('products', 'SELECT * FROM products WHERE id = ?', (_to_id(product_id),))
+
+    def get_products_by_status(self, status, limit=None):
+        return self._fetch_models(
+            'products', 'SELECT * FROM products WHERE status = ? ORDER BY id LIMIT ?',
+            (status, -1 if limit is None else limit)
+        )
+
+    def save_product(self, product):
+        if product.id is None:
+            product.id = self._insert('products', product.to_dict())
+        else:
+            product.id = _to_id(product.id)
+            self._upsert('products', product.to_dict())
+        return product
+
+    def update_product(self, product_id, update):
+        # BEGIN IMMEDIATE segura o lock de escrita desde a leitura: nenhum outro worker grava no meio.
+        with self._transaction():
+            product = self.get_product_by_id(product_id)
+            if product is not None and update(product) is not False:
+                self._upsert('products', product.to_dict())
+        return product
+
+    def delete_product(self, product_id):
+        return self._delete('products', product_id)
+
+    # --- FILTROS ---
+
+    def get_filters(self):
+        return self._fetch_models('filters', 'SELECT * FROM filters ORDER BY id')
+
+    def get_filter_by_id(self, filter_id):
+        return self._fetch_model('filters', 'SELECT * FROM filters WHERE id = ?', (_to_id(filter_id),))
+
+    def save_filter(self, filter_obj):
+        filter_obj.id = self._insert('filters', filter_obj.to_dict())
+
+    def delete_filter(self, filter_id):
+        return self._delete('filters', filter_id)
+
+    # --- AVALIAÇÕES ---
+
+    def get_reviews(self):
+        return self._fetch_models('reviews', 'SELECT * FROM reviews ORDER BY id')
+
+    def get_review_by_id(self, review_id):
+        return self._fetch_model('reviews', 'SELECT * FROM reviews WHERE id = ?', (_to_id(review_id),))
+
+    def get_reviews_by_product(self, product_id):
+        return self.get_reviews_page(product_id, limit=None)
+
+    def get_reviews_page(self, product_id, before=None, rating=None, limit=20):
+        # Percorre idx_reviews_product_date (ou idx_reviews_product_rating_date, com a nota) de trás
+        # para frente a partir do cursor: sem ordenar e sem ler as linhas das páginas anteriores.
+        sql = 'SELECT * FROM reviews WHERE product_id = ?'
+        params = [_to_id(product_id)]
+        if rating is not None:
+            sql += ' AND rating = ?'
+            params.append(rating)
+        if before is not None:
+            sql += ' AND (date_posted, id) < (?, ?)'
+            params += [before[0].isoformat(), before[1]]
+        sql += ' ORDER BY date_posted DESC, id DESC LIMIT ?'
+        params.append(-1 if limit is None else limit)
+        return self._fetch_models('reviews', sql, params)
+
+    def get_rating_counts(self):
+        rows = self._query('SELECT product_id, rating, COUNT(*) AS amount FROM reviews GROUP BY product_id, rating')
+        return [(row['product_id'], row['rating'], row['amount']) for row in rows]
+
+    def save_review(self, review):
+        review.id = _to_id(review.id)
+        if review.id is not None and self._exists('reviews', review.id):
+            self._upsert('reviews', review.to_dict())
+        else:
+            review.id = self._insert('reviews', review.to_dict())
+        return review
+
+    def delete_review(self, review_id):
+        return self._delete('reviews', review_id)
+
+    # --- VISITAS ---
+
+    def register_visits(self, visits):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                'INSERT INTO visits (timestamp, session_id) VALUES (?, ?)',
+                ((visit_time.isoformat(), session_id) for visit_time, session_id in visits)
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def iter_visits(self, start_time=None, end_time=None):
+        conditions, params = [], []
+        if start_time is not None:
+            conditions.append('timestamp >= ?')
+            params.append(start_time.isoformat())
+        if end_time is not None:
+            conditions.append('timestamp < ?')
+            params.append(end_time.isoformat())
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor = self._query(f'SELECT timestamp, session_id FROM visits{where} ORDER BY timestamp', params)
+        for timestamp_str, session_id in cursor:
+            visit = parse_visit(timestamp_str, session_id)
+            if visit is not None:
+                yield visit
+
+    def purge_visits(self, before):
+        return self._query('DELETE FROM visits WHERE timestamp < ?', (before.isoformat(),)).rowcount
+
+    def get_visits_count(self, time_range_str):
+        start_time = datetime.utcnow() - timedelta(days=VISITS_RANGE_DAYS.get(time_range_str, 365))
+        row = self._query(
+            'SELECT COUNT(DISTINCT session_id) FROM visits WHERE timestamp >= ?',
+            (start_time.isoformat(),)
+        ).fetchone()
+        return row[0]
+
+
+def _to_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
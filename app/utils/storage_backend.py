@@ -0,0 +1,247 @@
+from datetime import datetime, timedelta
+
+TABLES = ('users', 'products', 'filters', 'reviews')
+
+
+class StorageBackend:
+    """
+    Interface comum dos mecanismos de armazenamento usados pelo data_manager.
+
+    As rotas nunca falam com um backend diretamente: elas chamam as funções do
+    data_manager, que delegam para o backend escolhido em config.Config
+    (STORAGE_BACKEND). Todo backend recebe e devolve objetos de modelo
+    (User, Product, Filter, Review) e deve devolver cópias independentes,
+    que o chamador pode alterar sem afetar o armazenamento, inclusive as listas
+    de Product (images, filters, image_variants), copiadas por Product.__copy__.
+    """
+
+    name = None
+
+    # --- USUÁRIOS ---
+    def get_users(self):
+        raise NotImplementedError
+
+    def get_user_by_id(self, user_id):
+        raise NotImplementedError
+
+    def get_user_by_email(self, email):
+        raise NotImplementedError
+
+    def get_user_by_username(self, username):
+        raise NotImplementedError
+
+    def email_exists(self, email):
+        return self.get_user_by_email(email) is not None
+
+    def save_user(self, user):
+        """Insere (atribuindo um novo ID) ou atualiza um usuário."""
+        raise NotImplementedError
+
+    # --- PRODUTOS ---
+    def get_products(self):
+        raise NotImplementedError
+
+    def get_product_by_id(self, product_id):
+        raise NotImplementedError
+
+    def get_products_by_status(self, status, limit=None):
+        """Produtos com o status informado (ex: 'Em destaque'), em ordem de ID, até `limit` itens."""
+        products = [p for p in self.get_products() if p.status == status]
+        return products[:limit]
+
+    def save_product(self, product):
+        """Insere ou atualiza um produto. Retorna o produto com o ID definido."""
+        raise NotImplementedError
+
+    def update_product(self, product_id, update):
+        """
+        Leitura-modificação-escrita atômica de um produto existente: `update(product)` altera
+        a cópia lida já com o lock da tabela, de modo que nenhuma escrita concorrente (ex: uma
+        edição do admin) é sobrescrita. Se `update` retornar False, nada é gravado.
+        Retorna o produto (alterado ou não), ou None se ele não existir.
+        """
+        raise NotImplementedError
+
+    def delete_product(self, product_id):
+        """Remove um produto. Retorna True se ele existia."""
+        raise NotImplementedError
+
+    # --- FILTROS ---
+    def get_filters(self):
+        raise NotImplementedError
+
+    def get_filter_by_id(self, filter_id):
+        raise NotImplementedError
+
+    def save_filter(self, filter_obj):
+        raise NotImplementedError
+
+    def delete_filter(self, filter_id):
+        raise NotImplementedError
+
+    # --- AVALIAÇÕES ---
+    def get_reviews(self):
+        raise NotImplementedError
+
+    def get_review_by_id(self, review_id):
+        raise NotImplementedError
+
+    def get_reviews_by_product(self, product_id):
+        """Avaliações de um produto, da mais recente para a mais antiga (date_posted, depois ID)."""
+        reviews = [r for r in self.get_reviews() if r.product_id == product_id]
+        return sorted(reviews, key=lambda r: (r.date_posted, r.id), reverse=True)
+
+    def get_reviews_page(self, product_id, before=None, rating=None, limit=20):
+        """
+        Uma página das avaliações de um produto, da mais recente para a mais antiga: até `limit`
+        avaliações (todas, se None) com (date_posted, id) menor que o cursor `before`,
+        opcionalmente só as com a nota `rating`.
+        """
+        reviews = [
+            r for r in self.get_reviews_by_product(product_id)
+            if (rating is None or r.rating == rating) and (before is None or (r.date_posted, r.id) < before)
+        ]
+        return reviews if limit is None else reviews[:limit]
+
+    def get_rating_counts(self):
+        """Quantidade de avaliações por (ID do produto, nota), como tuplas (produto, nota, quantidade)."""
+        counts = {}
+        for review in self.get_reviews():
+            key = (review.product_id, review.rating)
+            counts[key] = counts.get(key, 0) + 1
+        return [(product_id, rating, amount) for (product_id, rating), amount in counts.items()]
+
+    def save_review(self, review):
+        """Insere ou atualiza uma avaliação. Retorna a avaliação com o ID definido."""
+        raise NotImplementedError
+
+    def delete_review(self, review_id):
+        """Remove uma avaliação. Retorna True se ela existia."""
+        raise NotImplementedError
+
+    # --- VERSÕES ---
+    def write_lock(self, *tables):
+        """
+        Context manager que segura o lock de escrita das tabelas (entre processos) durante o
+        bloco. As escritas e leituras do próprio backend dentro dele continuam funcionando, e
+        nenhum outro processo altera essas tabelas até o fim do bloco: quem precisa ler
+        table_version logo antes e logo depois de uma escrita (ex: os índices derivados do
+        data_manager) sabe que a diferença é só a sua.
+        """
+        raise NotImplementedError
+
+    def table_version(self, table):
+        """
+        Valor opaco que muda sempre que a tabela é alterada, inclusive por outro
+        processo. Permite que caches derivados (ex: o índice de busca) saibam
+        quando precisam ser reconstruídos.
+        """
+        raise NotImplementedError
+
+    # --- IDS ---
+    def next_id(self, table):
+        """Retorna, sem reservar, o próximo ID que seria atribuído na tabela."""
+        raise NotImplementedError
+
+    # --- VISITAS ---
+    def register_visit(self, session_id):
+        self.register_visits([(datetime.utcnow(), session_id)])
+
+    def register_visits(self, visits):
+        """Grava de uma só vez uma lista de tuplas (datetime, session_id)."""
+        raise NotImplementedError
+
+    def iter_visits(self, start_time=None, end_time=None):
+        """Gera tuplas (datetime, session_id) das visitas em [start_time, end_time)."""
+        raise NotImplementedError
+
+    def purge_visits(self, before):
+        """
+        Política de retenção: apaga do log bruto as visitas anteriores a `before`.
+        Backends particionados podem manter as visitas da partição que contém `before`.
+        Retorna o número de partições (ou linhas) removidas.
+        """
+        raise NotImplementedError
+
+    def get_visits_count(self, time_range_str):
+        """Calcula o número de visitas únicas em um determinado período de tempo."""
+        now = datetime.utcnow()
+        start_time = now - timedelta(days=VISITS_RANGE_DAYS.get(time_range_str, 365))
+        return len({session_id for _, session_id in self.iter_visits(start_time)})
+
+    def get_visits_per_period(self, period='day'):
+        """Agrupa as visitas únicas por período (dia, semana, mês, ano)."""
+        start_time, date_format, labels = period_labels(period, datetime.utcnow())
+        counts = {label: set() for label in labels}
+        for visit_time, session_id in self.iter_visits(start_time):
+            key = visit_time.strftime(date_format)
+            if key in counts:
+                counts[key].add(session_id)
+        return [{"date": label, "count": len(counts[label])} for label in labels]
+
+
+VISITS_RANGE_DAYS = {'24h': 1, '7d': 7, '30d': 30, '12m': 365}
+
+
+def period_labels(period, now):
+    """
+    Retorna (início da janela, formato strftime do rótulo, lista de rótulos)
+    para os gráficos de visitas por dia, semana, mês ou ano.
+    """
+    if period == 'day':
+        start_time = now - timedelta(days=6)
+        date_format = '%d/%m'
+        labels = [(start_time + timedelta(days=i)).strftime(date_format) for i in range(7)]
+    elif period == 'week':
+        start_time = now - timedelta(weeks=6)
+        date_format = 'W%U'
+        labels = [(start_time + timedelta(weeks=i)).strftime(date_format) for i in range(7)]
+    elif period == 'month':
+        start_time = now - timedelta(days=365)
+        date_format = '%b/%y'
+        labels = []
+        for i in range(12):
+            month = now.month - i
+            year = now.year
+            if month <= 0:
+                month += 12
+                year -= 1
+            labels.append(datetime(year, month, 1).strftime(date_format))
+        labels.reverse()
+    else:
+        start_time = now - timedelta(days=5*365)
+        date_format = '%Y'
+        labels = [str(year) for year in range(now.year - 4, now.year + 1)]
+    return start_time, date_format, labels
+
+
+def decode_rows(model, rows):
+    """
+    Converte linhas (dicionários coluna -> texto) em objetos do modelo. Modelos com from_rows
+    decodificam a tabela inteira de uma vez; se alguma linha estiver corrompida, a conversão
+    refaz linha a linha com from_dict, ignorando só as inválidas em vez de derrubar a tabela.
+    """
+    rows = list(rows)
+    from_rows = getattr(model, 'from_rows', None)
+    if from_rows is not None:
+        try:
+            return from_rows(rows)
+        except (KeyError, ValueError, TypeError):
+            pass
+    objects = []
+    for row in rows:
+        try:
+            objects.append(model.from_dict(row))
+        except (KeyError, ValueError, TypeError) as e:
+            print(f"Linha ignorada em {model.__name__}: {e}")
+    return objects
+
+
+def parse_visit(timestamp_str, session_id):
+    """Converte uma linha do log de visitas. Retorna None se ela estiver incompleta ou inválida."""
+    if not timestamp_str or not session_id:
+        return None
+    try:
+        return datetime.fromisoformat(timestamp_str.strip()), session_id
+    except ValueError:
+        return None
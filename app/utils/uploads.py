@@ -0,0 +1,65 @@
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from werkzeug.utils import secure_filename
+
+# Os arquivos enviados são copiados em blocos deste tamanho: a memória usada por envio é
+# constante, seja uma miniatura ou uma foto de 20 MB.
+UPLOAD_CHUNK_SIZE = 256 * 1024
+UPLOAD_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def run_parallel(function, items):
+    """
+    Aplica `function` a cada item em um pool de threads (E/S de disco). Retorna os resultados
+    em ordem; se algum falhar, a exceção é relançada só depois que todos terminarem.
+    """
+    global _executor
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='uploads')
+    futures = [_executor.submit(function, item) for item in items]
+    wait(futures)
+    return [future.result() for future in futures]
+
+
+def file_sha256(path):
+    """SHA-256 (hex) do conteúdo do arquivo, lido em blocos, ou None se ele não existir."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def stage_upload(file_storage, folder):
+    """
+    Copia um arquivo enviado (FileStorage) para um temporário em `folder`, em blocos,
+    calculando o SHA-256 durante a cópia. Retorna (nome seguro, caminho temporário, hash).
+    """
+    os.makedirs(folder, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    try:
+        # mkstemp cria o arquivo com permissão 0600; o arquivo final é servido como estático.
+        os.chmod(temp_path, 0o644)
+        with os.fdopen(fd, 'wb') as target:
+            for chunk in iter(lambda: file_storage.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                digest.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return secure_filename(file_storage.filename or '') or 'imagem', temp_path, digest.hexdigest()
+
@@ -0,0 +1,94 @@
+import os
+import atexit
+import threading
+from datetime import datetime
+
+
+class VisitRecorder:
+    """
+    Fila em memória de visitas, gravada em lote por uma thread em segundo plano.
+
+    `record` apenas enfileira (timestamp, session_id) e retorna, tirando o acesso
+    ao disco do caminho da requisição. A thread descarrega a fila quando ela atinge
+    `batch_size` itens ou a cada `flush_interval` segundos, o que vier primeiro,
+    entregando o lote inteiro a `sink` (uma única escrita por lote). Na saída do
+    processo, `stop` faz a descarga final.
+
+    A thread é criada sob demanda no processo que grava, de modo que workers
+    criados por fork (gunicorn --preload) tenham cada um a sua.
+    """
+
+    def __init__(self, sink, batch_size=100, flush_interval=2.0, max_pending=10000):
+        """
+        Args:
+            sink (callable): recebe uma lista de tuplas (datetime, session_id) e as persiste.
+            batch_size (int): quantidade de visitas que dispara uma descarga imediata.
+            flush_interval (float): intervalo máximo, em segundos, entre descargas.
+            max_pending (int): limite da fila se o armazenamento ficar indisponível;
+                acima dele as visitas mais antigas são descartadas.
+        """
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._reset_process_state()
+        atexit.register(self.stop)
+
+    def _reset_process_state(self):
+        self._pid = os.getpid()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            # Processo filho após fork: a fila e a thread pertencem ao processo pai.
+            self._reset_process_state()
+        if self._thread is None and not self._stopped:
+            self._thread = threading.Thread(target=self._run, name='visit-recorder', daemon=True)
+            self._thread.start()
+
+    def record(self, session_id, timestamp=None):
+        """Enfileira uma visita. Não faz I/O."""
+        self._ensure_thread()
+        with self._lock:
+            self._pending.append((timestamp or datetime.utcnow(), session_id))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Grava imediatamente todas as visitas pendentes deste processo."""
+        if self._pid != os.getpid():
+            return
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                self.sink(batch)
+            except Exception as e:
+                print(f"Erro ao gravar lote de {len(batch)} visitas: {e}")
+                with self._lock:
+                    # Devolve o lote para a próxima tentativa, respeitando o limite da fila.
+                    self._pending = (batch + self._pending)[-self.max_pending:]
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self):
+        """Encerra a thread e faz a descarga final (chamado automaticamente via atexit)."""
+        if self._pid != os.getpid():
+            return
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
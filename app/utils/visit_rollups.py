@@ -0,0 +1,360 @@
+import os
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from app.utils.safe_io import file_lock, atomic_write
+from app.utils.hyperloglog import HyperLogLog
+from app.utils.storage_backend import VISITS_RANGE_DAYS, period_labels
+
+# Formato da chave de cada bucket; cada granularidade tem uma subpasta própria.
+BUCKET_FORMATS = {
+    'hour': '%Y-%m-%dT%H',
+    'day': '%Y-%m-%d',
+    'week': '%Y-W%U',
+    'month': '%Y-%m',
+    'year': '%Y',
+}
+# Só estas granularidades guardam o conjunto exato de sessões: o tamanho de cada arquivo
+# fica limitado aos visitantes de um dia. Semana, mês e ano têm apenas o sketch HyperLogLog.
+EXACT_GRANULARITIES = ('hour', 'day')
+# Quantos buckets lidos do disco ficam em cache na memória (os menos usados saem primeiro).
+CACHE_SIZE = 512
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _next_month(moment):
+    if moment.month == 12:
+        return moment.replace(year=moment.year + 1, month=1)
+    return moment.replace(month=moment.month + 1)
+
+
+def cover_window(start, end, coarsest='month'):
+    """
+    Decompõe a janela [start, end] no menor conjunto de buckets (granularidade, chave):
+    horas até o primeiro limite de dia, dias até o primeiro limite de mês e meses a partir daí.
+    O último bucket pode ultrapassar `end`, pois não existem visitas no futuro.
+    Janelas de mais de dois dias começam no dia de `start`, sem usar buckets de hora.
+    Com coarsest='day' a janela é coberta só por horas e dias (os buckets com conjuntos exatos).
+    """
+    if end - start <= timedelta(days=2):
+        moment = start.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    buckets = []
+    while moment <= end:
+        if coarsest == 'month' and moment.day == 1 and moment.hour == 0:
+            buckets.append(('month', moment.strftime(BUCKET_FORMATS['month'])))
+            moment = _next_month(moment)
+        elif moment.hour == 0:
+            buckets.append(('day', moment.strftime(BUCKET_FORMATS['day'])))
+            moment += timedelta(days=1)
+        else:
+            buckets.append(('hour', moment.strftime(BUCKET_FORMATS['hour'])))
+            moment += timedelta(hours=1)
+    return buckets
+
+
+def day_keys(granularity, key):
+    """Chaves dos buckets de dia contidos em um bucket de semana, mês ou ano (hora e dia ficam como estão)."""
+    if granularity in EXACT_GRANULARITIES:
+        return [(granularity, key)]
+    if granularity == 'week':
+        # %U conta semanas a partir de domingo; a semana 0 pode começar no ano anterior.
+        start = datetime.strptime(key + '-0', BUCKET_FORMATS['week'] + '-%w')
+        end = start + timedelta(days=7)
+    elif granularity == 'month':
+        start = datetime.strptime(key, BUCKET_FORMATS['month'])
+        end = _next_month(start)
+    else:
+        start = datetime.strptime(key, BUCKET_FORMATS['year'])
+        end = start.replace(year=start.year + 1)
+    days = []
+    moment = start
+    while moment < end:
+        if moment.strftime(BUCKET_FORMATS[granularity]) == key:
+            days.append(('day', moment.strftime(BUCKET_FORMATS['day'])))
+        moment += timedelta(days=1)
+    return days
+
+
+def period_buckets(period, now):
+    """Retorna a lista de (rótulo do gráfico, granularidade, chave do bucket) de um período."""
+    start_time, date_format, labels = period_labels(period, now)
+    if period == 'day':
+        moments = [start_time + timedelta(days=i) for i in range(len(labels))]
+        granularity = 'day'
+    elif period == 'week':
+        moments = [start_time + timedelta(weeks=i) for i in range(len(labels))]
+        granularity = 'week'
+    elif period == 'month':
+        moments = [datetime.strptime(label, date_format) for label in labels]
+        granularity = 'month'
+    else:
+        moments = [datetime(int(label), 1, 1) for label in labels]
+        granularity = 'year'
+    return [(label, granularity, moment.strftime(BUCKET_FORMATS[granularity]))
+            for label, moment in zip(labels, moments)]
+
+
+class VisitRollups:
+    """
+    Agregados de sessões distintas por hora, dia, semana, mês e ano.
+
+    Cada bucket é um pequeno arquivo JSON em `folder/<granularidade>/<chave>.json`,
+    atualizado de forma incremental a cada lote de visitas gravado. Assim, as
+    consultas do painel leem um número fixo de buckets (em cache enquanto o arquivo
+    não muda), em tempo independente do tamanho do log bruto. A união de sessões
+    é idempotente: aplicar o mesmo lote duas vezes não altera as contagens.
+
+    Conjuntos exatos de sessões existem só nos buckets de hora e dia, então gravar um
+    lote reescreve no máximo os arquivos dos dias afetados, nunca o ano inteiro. Todo
+    bucket tem também um sketch HyperLogLog de tamanho fixo em
+    `folder/hll/<granularidade>/<chave>.json`. No modo exato, semanas, meses, anos e
+    janelas longas unem os conjuntos dos dias que as compõem (custo proporcional aos
+    visitantes do período); no modo aproximado unem os sketches, com o erro de
+    VISITS_HLL_ERROR. Com `keep_exact=False` os conjuntos exatos deixam de ser mantidos
+    e tudo é aproximado. Só os CACHE_SIZE buckets usados mais recentemente ficam em memória.
+    """
+
+    META_FILE = '_meta.json'
+
+    def __init__(self, folder, hll_error=0.02, keep_exact=True):
+        self.folder = folder
+        self.keep_exact = keep_exact
+        self.hll_precision = HyperLogLog.precision_for_error(hll_error)
+        self._lock_path = os.path.join(folder, 'rollups')
+        self._cache = OrderedDict()
+        self._cache_lock = threading.RLock()
+
+    def _bucket_path(self, kind, granularity, key):
+        if kind == 'hll':
+            return os.path.join(self.folder, 'hll', granularity, key + '.json')
+        return os.path.join(self.folder, granularity, key + '.json')
+
+    def _empty(self, kind):
+        return HyperLogLog(self.hll_precision) if kind == 'hll' else set()
+
+    def _load(self, kind, granularity, key):
+        """
+        Retorna o conteúdo do bucket (set de sessões ou HyperLogLog), relendo o
+        arquivo só se ele mudou. O objeto devolvido não deve ser alterado.
+        """
+        path = self._bucket_path(kind, granularity, key)
+        signature = _file_signature(path)
+        with self._cache_lock:
+            cached = self._cache.get((kind, granularity, key))
+            if cached is not None and cached[0] == signature:
+                self._cache.move_to_end((kind, granularity, key))
+                return cached[1]
+            value = self._empty(kind)
+            if signature is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as file:
+                        data = json.load(file)
+                    value = HyperLogLog.from_dict(data) if kind == 'hll' else set(data['sessions'])
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Erro ao ler o agregado de visitas {path}: {e}")
+            self._remember((kind, granularity, key), signature, value)
+            return value
+
+    def _remember(self, bucket, signature, value):
+        with self._cache_lock:
+            self._cache[bucket] = (signature, value)
+            self._cache.move_to_end(bucket)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _store(self, kind, granularity, key, value):
+        path = self._bucket_path(kind, granularity, key)
+        with atomic_write(path) as file:
+            json.dump(value.to_dict() if kind == 'hll' else {'sessions': sorted(value)}, file)
+        self._remember((kind, granularity, key), _file_signature(path), value)
+
+    def _group(self, visits):
+        """Agrupa um lote de visitas por (tipo, granularidade, chave) -> sessões."""
+        touched = {}
+        for visit_time, session_id in visits:
+            for granularity, bucket_format in BUCKET_FORMATS.items():
+                key = visit_time.strftime(bucket_format)
+                if self.keep_exact and granularity in EXACT_GRANULARITIES:
+                    touched.setdefault(('sessions', granularity, key), set()).add(session_id)
+                touched.setdefault(('hll', granularity, key), set()).add(session_id)
+        return touched
+
+    def is_built(self):
+        """Indica se os agregados já foram montados (ou compactados) a partir do log bruto."""
+        return os.path.exists(os.path.join(self.folder, self.META_FILE))
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.folder, self.META_FILE), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, **updates):
+        meta = self._read_meta()
+        meta.update(updates)
+        with atomic_write(os.path.join(self.folder, self.META_FILE)) as file:
+            json.dump(meta, file)
+
+    def compacted_before(self):
+        """Data a partir da qual o log bruto ainda existe, ou None se nada foi descartado."""
+        value = self._read_meta().get('compacted_before')
+        return datetime.fromisoformat(value) if value else None
+
+    def mark_compacted(self, before):
+        """Registra que as visitas anteriores a `before` só existem nos agregados."""
+        with file_lock(self._lock_path):
+            current = self.compacted_before()
+            if current is None or before > current:
+                self._write_meta(compacted_before=before.isoformat())
+
+    def prune(self, granularity, before):
+        """Apaga os buckets de `granularity` anteriores a `before`. Retorna quantos foram removidos."""
+        limit = before.strftime(BUCKET_FORMATS[granularity])
+        removed = 0
+        with file_lock(self._lock_path):
+            for kind in ('sessions', 'hll'):
+                folder = os.path.dirname(self._bucket_path(kind, granularity, limit))
+                try:
+                    names = os.listdir(folder)
+                except FileNotFoundError:
+                    continue
+                for name in names:
+                    key = name[:-len('.json')]
+                    if name.endswith('.json') and key < limit:
+                        os.remove(os.path.join(folder, name))
+                        with self._cache_lock:
+                            self._cache.pop((kind, granularity, key), None)
+                        removed += 1
+        return removed
+
+    def add(self, visits):
+        """Incorpora um lote de tuplas (datetime, session_id) aos buckets afetados."""
+        touched = self._group(visits)
+        with file_lock(self._lock_path):
+            for (kind, granularity, key), sessions in touched.items():
+                current = self._load(kind, granularity, key)
+                if kind == 'hll':
+                    updated = HyperLogLog(current.precision, bytearray(current.registers))
+                    updated.update(sessions)
+                    if updated.registers != current.registers:
+                        self._store(kind, granularity, key, updated)
+                elif not sessions <= current:
+                    self._store(kind, granularity, key, current | sessions)
+
+    def rebuild(self, visits):
+        """
+        Compacta o log bruto: descarta todos os buckets e os recalcula a partir de `visits`
+        (iterável de tuplas (datetime, session_id), lido em streaming).
+
+        Se partições antigas do log já foram descartadas pela retenção (mark_compacted),
+        os buckets existentes são a única cópia desse histórico: nesse caso as visitas
+        são apenas incorporadas a eles, como em `add`.
+        """
+        with file_lock(self._lock_path):
+            if self.compacted_before() is not None:
+                batch = []
+                for visit in visits:
+                    batch.append(visit)
+                    if len(batch) >= 10000:
+                        self.add(batch)
+                        batch = []
+                self.add(batch)
+                self._write_meta(rebuilt_at=datetime.utcnow().isoformat())
+                return
+            buckets = {}
+            for (kind, granularity, key), sessions in self._group(visits).items():
+                if kind == 'sessions':
+                    buckets[(kind, granularity, key)] = sessions
+                elif granularity in ('hour', 'day'):
+                    sketch = self._empty('hll')
+                    sketch.update(sessions)
+                    buckets[(kind, granularity, key)] = sketch
+            # Semanas, meses e anos vêm da união dos sketches diários, sem reler as sessões.
+            for (kind, granularity, key), sketch in list(buckets.items()):
+                if kind != 'hll' or granularity != 'day':
+                    continue
+                day = datetime.strptime(key, BUCKET_FORMATS['day'])
+                for coarser in ('week', 'month', 'year'):
+                    target = ('hll', coarser, day.strftime(BUCKET_FORMATS[coarser]))
+                    if target not in buckets:
+                        buckets[target] = self._empty('hll')
+                    buckets[target].merge(sketch)
+            for granularity in BUCKET_FORMATS:
+                shutil.rmtree(os.path.join(self.folder, granularity), ignore_errors=True)
+            shutil.rmtree(os.path.join(self.folder, 'hll'), ignore_errors=True)
+            with self._cache_lock:
+                self._cache.clear()
+            for (kind, granularity, key), value in buckets.items():
+                self._store(kind, granularity, key, value)
+            self._write_meta(rebuilt_at=datetime.utcnow().isoformat())
+
+    def ensure_built(self, visits_source):
+        """
+        Monta os agregados a partir do log bruto na primeira execução.
+        `visits_source` é chamado (com o lock já obtido) apenas se ainda for necessário,
+        de modo que vários workers iniciando juntos fazem a compactação uma única vez.
+        """
+        if self.is_built():
+            self._drop_coarse_sessions()
+            return
+        with file_lock(self._lock_path):
+            if not self.is_built():
+                self.rebuild(visits_source())
+
+    def _drop_coarse_sessions(self):
+        """Apaga conjuntos exatos de semana, mês e ano gravados por versões anteriores."""
+        folders = [os.path.join(self.folder, granularity)
+                   for granularity in BUCKET_FORMATS if granularity not in EXACT_GRANULARITIES]
+        if not any(os.path.isdir(folder) for folder in folders):
+            return
+        with file_lock(self._lock_path):
+            for folder in folders:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    def distinct_sessions(self, buckets, approximate=False):
+        """
+        Número de sessões distintas na união dos buckets (granularidade, chave) informados.
+        No modo exato, buckets de semana, mês e ano são trocados pelos dias que os compõem.
+        """
+        if approximate or not self.keep_exact:
+            sketch = self._empty('hll')
+            for granularity, key in buckets:
+                sketch.merge(self._load('hll', granularity, key))
+            return sketch.count()
+        sessions = set()
+        for bucket in buckets:
+            for granularity, key in day_keys(*bucket):
+                sessions |= self._load('sessions', granularity, key)
+        return len(sessions)
+
+    def get_visits_count(self, time_range_str, now=None, approximate=False):
+        """
+        Visitas únicas na janela ('24h', '7d', '30d', '12m'), calculadas pelos buckets.
+        """
+        now = now or datetime.utcnow()
+        start_time = now - timedelta(days=VISITS_RANGE_DAYS.get(time_range_str, 365))
+        approximate = approximate or not self.keep_exact
+        buckets = cover_window(start_time, now, coarsest='month' if approximate else 'day')
+        return self.distinct_sessions(buckets, approximate=approximate)
+
+    def get_visits_per_period(self, period='day', now=None, approximate=False):
+        """
+        Visitas únicas por dia, semana, mês ou ano, lidas de um bucket por rótulo (no modo
+        exato, dos dias que compõem o bucket).
+        """
+        now = now or datetime.utcnow()
+        approximate = approximate or not self.keep_exact
+        return [{"date": label, "count": self.distinct_sessions([(granularity, key)], approximate=approximate)}
+                for label, granularity, key in period_buckets(period, now)]
@@ -8,6 +8,58 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'uma-chave-secreta-dificil-de-adivinhar'
 
     UPLOAD_FOLDER = os.path.join(basedir, 'app', 'static', 'uploads')
+    # Arquivos enviados (imagens de produtos e fotos de perfil) são guardados uma única vez,
+    # com o SHA-256 do conteúdo no nome, e servidos com cache permanente.
+    BLOB_FOLDER = os.path.join(UPLOAD_FOLDER, 'blobs')
+    BLOB_URL_PREFIX = '/static/uploads/blobs'
+
+    # Mecanismo de armazenamento usado pelo data_manager: 'csv' (padrão, arquivos em
+    # banco_de_dados/) ou 'sqlite' (banco único em modo WAL, com índices).
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND') or 'csv'
+    SQLITE_DATABASE = os.environ.get('SQLITE_DATABASE') or os.path.join(basedir, 'banco_de_dados', 'decibell.sqlite3')
+
+    # Visitas são enfileiradas em memória e gravadas em lote por uma thread em segundo
+    # plano, ao atingir VISITS_FLUSH_SIZE itens ou a cada VISITS_FLUSH_INTERVAL segundos.
+    VISITS_BUFFERED = True
+    VISITS_FLUSH_SIZE = 100
+    VISITS_FLUSH_INTERVAL = 2.0
+    # As estatísticas do painel são respondidas por agregados pré-calculados por
+    # hora/dia/semana/mês/ano (banco_de_dados/visit_rollups/), e não pelo log bruto.
+    VISITS_ROLLUPS = True
+    # Contagem aproximada de sessões distintas com HyperLogLog: VISITS_HLL_ERROR é o erro
+    # padrão desejado (0.02 = 2%). Com VISITS_APPROXIMATE = False as contagens são exatas
+    # (semanas, meses e anos unem os conjuntos diários, custo proporcional aos visitantes).
+    # Com VISITS_EXACT_ROLLUPS = False só os sketches são mantidos e tudo é aproximado.
+    VISITS_APPROXIMATE = os.environ.get('VISITS_APPROXIMATE', '').lower() in ('1', 'true', 'yes')
+    VISITS_HLL_ERROR = 0.02
+    VISITS_EXACT_ROLLUPS = True
+    # Retenção: com VISITS_RETENTION_MONTHS > 0 (ex: 13), o log bruto
+    # (banco_de_dados/visits/AAAA-MM.csv) guarda só os últimos meses e as partições mais
+    # antigas ficam apenas nos agregados. Desativada por padrão: apagar o histórico bruto
+    # é uma escolha do operador. Buckets por hora são mantidos por
+    # VISITS_HOURLY_RETENTION_DAYS dias. 0 desativa.
+    VISITS_RETENTION_MONTHS = int(os.environ.get('VISITS_RETENTION_MONTHS', 0))
+    VISITS_HOURLY_RETENTION_DAYS = 7
+
+    # Por quantos segundos navegadores e proxies podem reutilizar as respostas das APIs
+    # públicas do catálogo sem revalidar (depois disso, revalidam com If-None-Match).
+    CATALOG_CACHE_MAX_AGE = 60
+
+    # Respostas HTML/JSON/CSS/JS maiores que COMPRESS_MIN_SIZE bytes são enviadas com gzip
+    # (ou brotli, se instalado). Arquivos estáticos pré-comprimidos com `flask compress-static`
+    # são servidos direto do disco, com cache de STATIC_MAX_AGE segundos.
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 500
+    COMPRESS_LEVEL = 6
+    STATIC_MAX_AGE = 7 * 24 * 60 * 60
+    # Com ASSETS_DEBUG, os templates usam os arquivos CSS/JS originais mesmo que os
+    # pacotes de `flask build-assets` existam (útil ao editar os estilos).
+    ASSETS_DEBUG = False
+    # Imagens de produtos enviadas pelo admin ganham versões com essas larguras (e em WebP),
+    # geradas em segundo plano por IMAGE_WORKERS threads. Requer o Pillow; sem ele, nada muda.
+    IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+    IMAGE_QUALITY = 80
+    IMAGE_WORKERS = 2
 
     @staticmethod
     def init_app(app):
@@ -29,6 +81,10 @@ class TestingConfig(Config):
     TESTING = True
     # Desativa a proteção CSRF nos testes para simplificar as requisições.
     WTF_CSRF_ENABLED = False
+    # Grava as visitas de forma síncrona, para que os testes vejam o resultado na hora.
+    VISITS_BUFFERED = False
+    # Processa as imagens na própria requisição, sem o pool de threads.
+    IMAGE_WORKERS = 0
 
 # Dicionário que mapeia os nomes das configurações às suas respectivas classes.
 # Isso permite carregar a configuração correta a partir de uma string no run.py.
@@ -40,8 +40,7 @@ def create_admin_user():
     email = input("Digite o email para o admin: ")
     password = input("Digite a senha para o admin: ")
 
-    users = data_manager.get_users()
-    if any(u.email == email or u.username == username for u in users):
+    if data_manager.email_exists(email) or data_manager.get_user_by_username(username):
         print("Já existe um usuário ou email com este nome. Por favor, tente novamente com outro.")
         username = input("Digite o nome de usuário para o admin: ")
         email = input("Digite o email para o admin: ")